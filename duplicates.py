@@ -3,6 +3,10 @@ DataFrame with tolerances.
 
 """
 
+import contextlib
+import time
+import tracemalloc
+
 from toolz.curried import curry, compose
 import pandas as pd
 import numpy as np
@@ -40,6 +44,173 @@ def debug(statement, value):
     return value
 
 
+PROFILERS = []  # the callbacks of the active `profiled` contexts
+PEAKS = []  # the memory at start and the peak memory of the running stages
+
+
+def fold_peak():
+    """Fold the traced peak memory into the peaks of the running stages
+
+    A stage resets the peak of `tracemalloc`, so the peak reached so far
+    is kept first for the stages it is nested in.
+    """
+    peak = tracemalloc.get_traced_memory()[1]
+    for frame in PEAKS:
+        frame[1] = max(frame[1], peak)
+
+
+def reset_peak():
+    """Reset the traced peak memory to the current memory
+
+    `tracemalloc.reset_peak` is only available from Python 3.9, before
+    that the tracing is restarted, which also resets the current memory
+    to zero, so the memory of the running stages is shifted by as much.
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+        return
+    current = tracemalloc.get_traced_memory()[0]
+    limit = tracemalloc.get_traceback_limit()
+    tracemalloc.stop()
+    tracemalloc.start(limit)
+    for frame in PEAKS:
+        frame[0] -= current
+        frame[1] -= current
+
+
+def count_rows(value):
+    """Count the rows of a stage input or output
+
+    Boolean masks count their selected rows and tuples of arrays count
+    the rows of their first array.
+
+    >>> count_rows(np.array([True, False, True]))
+    2
+    >>> count_rows(pd.DataFrame(dict(A=[1, 2])))
+    2
+
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if getattr(value, "dtype", None) == bool:
+        return int(value.sum())
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+@curry
+def stage(name, func, value):
+    """Run a named stage of a pipeline, profiled if requested
+
+    Within a `profiled` context, the wall time, the rows in and out
+    and the peak memory of the stage are reported to the active
+    callbacks. Otherwise `func` is simply applied to `value`.
+
+    >>> with profiled() as stages:
+    ...     assert stage("double", lambda x: x * 2, np.arange(3)).sum() == 6
+    >>> [(s["name"], s["rows_in"], s["rows_out"]) for s in stages]
+    [('double', 3, 3)]
+
+    """
+    if not PROFILERS:
+        return func(value)
+
+    tracing, peak = tracemalloc.is_tracing(), None
+    if tracing:
+        fold_peak()
+        PEAKS.append([tracemalloc.get_traced_memory()[0]] * 2)
+        reset_peak()
+    start = time.perf_counter()
+    try:
+        result = func(value)
+    finally:
+        seconds = time.perf_counter() - start
+        if tracing:
+            fold_peak()
+            current, peak = PEAKS.pop()
+            peak -= current
+
+    record = {
+        "name": name,
+        "seconds": seconds,
+        "rows_in": count_rows(value),
+        "rows_out": count_rows(result),
+        "peak_bytes": peak,
+    }
+    for callback in list(PROFILERS):
+        callback(record)
+    return result
+
+
+@contextlib.contextmanager
+def profiled(callback=None, memory=True):
+    """Profile the pipeline stages run within the context
+
+    Args:
+      callback: called with the record of each stage as it completes
+      memory: trace the peak memory of the stages, which slows down
+        the allocations
+
+    Returns:
+      a context yielding the list of the stage records
+
+    """
+    stages = []
+
+    def report(record):
+        stages.append(record)
+        if callback is not None:
+            callback(record)
+
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    PROFILERS.append(report)
+    try:
+        yield stages
+    finally:
+        PROFILERS.remove(report)
+        if started:
+            tracemalloc.stop()
+
+
+def summarize(stages):
+    """Aggregate the stage records by name
+
+    >>> summarize([
+    ...     dict(name="a", seconds=1.0, rows_in=2, rows_out=1, peak_bytes=5),
+    ...     dict(name="a", seconds=2.0, rows_in=3, rows_out=3, peak_bytes=4),
+    ... ])["a"]["seconds"]
+    3.0
+
+    """
+    totals = {}
+    for record in stages:
+        total = totals.setdefault(
+            record["name"],
+            {
+                "calls": 0,
+                "seconds": 0.0,
+                "rows_in": 0,
+                "rows_out": 0,
+                "peak_bytes": None,
+            },
+        )
+        total["calls"] += 1
+        total["seconds"] += record["seconds"]
+        for key in ("rows_in", "rows_out"):
+            total[key] = (
+                None
+                if total[key] is None or record[key] is None
+                else total[key] + record[key]
+            )
+        if record["peak_bytes"] is not None:
+            total["peak_bytes"] = max(total["peak_bytes"] or 0, record["peak_bytes"])
+    return totals
+
+
 def find_duplicates_col(dataframe):
     """Find duplicates column by column.
 
@@ -63,6 +234,10 @@ def find_duplicates_col(dataframe):
     2  False  False   True   True  False
 
     """
+    if dataframe.empty:
+        # `apply` would call the function on an empty column and get a
+        # single value back
+        return dataframe.astype(bool)
     return dataframe.apply(
         sequence(np.array, lambda x: x[:-1] == x[1:], npappend([False])), axis=0
     )
@@ -140,8 +315,313 @@ def fduplicates(dcols, fcols, dataframe):
     )
 
 
+def find_duplicates_codes(codes):
+    """Find duplicates column by column on integer codes.
+
+    Vectorized version of `find_duplicates_col` that works on the
+    output of `fingerprint`.
+
+    Args:
+      codes: a 2-D integer array
+
+    Returns:
+      a bool array of the same shape indicating neighboring duplicates
+      in the same column
+
+    >>> find_duplicates_codes(np.array([[0, 0, 0], [0, 1, 0], [1, 0, 0]]))
+    array([[False, False, False],
+           [ True, False,  True],
+           [False, False,  True]])
+
+    """
+    dups = np.zeros(codes.shape, dtype=bool)
+    dups[1:] = codes[1:] == codes[:-1]
+    return dups
+
+
+def duplicate_if_close_array(values, tolerances):
+    """Find neighboring column duplicates based on tolerances.
+
+    Vectorized version of `duplicate_if_close` on a 2-D float array.
+
+    Args:
+      values: a 2-D float array
+      tolerances: the absolute tolerances, one per column
+
+    Returns:
+      a bool array of the same shape indicating neighboring close
+      values in the same column
+
+    >>> duplicate_if_close_array(
+    ...     np.array([[1.01, 1.1, 1], [1.02, 1.0, 1.1], [1.03, 0.99, 1.2]]),
+    ...     np.array([0.02, 0.02, 0.02])
+    ... )
+    array([[False, False, False],
+           [ True, False, False],
+           [ True,  True, False]])
+
+    """
+    dups = np.zeros(values.shape, dtype=bool)
+    dups[1:] = np.absolute(np.diff(values, axis=0)) <= tolerances
+    return dups
+
+
+@curry
+def fduplicates_array(dcols, fcols, dataframe):
+    """Check for mixture of exact duplicates and closeness
+
+    Vectorized version of `fduplicates`. The `fcols` are converted to
+    a single float array and the `dcols` to their fingerprints so that
+    the rows are reduced across all columns in one step.
+
+    Args:
+      dcols: the columns to check for exact duplicates
+      fcols: the columns to check for closeness, a dict with column names as
+       keys and tolerances as values
+      dataframe: the dataframe
+
+    Returns:
+      a bool array, True for rows that are close to the previous row in
+      all columns
+
+    >>> fduplicates_array(
+    ...     dcols=['C', 'D', 'E'],
+    ...     fcols=dict(A=0.02, B=0.02),
+    ...     dataframe=pd.DataFrame(
+    ...         dict(A=[1.01, 1.02, 1.03],
+    ...              B=[1.1, 1.09, 0.99],
+    ...              C=[1, 1, 'b'],
+    ...              D=[  'a',   'a',   'a'],
+    ...              E=[  1,   1,   1])
+    ...     )
+    ... )
+    array([False,  True, False])
+
+    """
+    close = duplicate_if_close_array(
+        dataframe[list(fcols.keys())].values.astype(float),
+        np.array(list(fcols.values()), dtype=float),
+    )
+    same = find_duplicates_codes(fingerprint(dataframe, dcols))
+    return close.all(axis=1) & same.all(axis=1)
+
+
+HASH_KEYS = ("0123456789123456", "fedcba9876543210")
+
+
+def fingerprint(dataframe, dcols, bits=64):
+    """Reduce the `dcols` of each row to a 64 or 128-bit integer.
+
+    Rows with the same `dcols` values, missing values being equal to
+    each other, get the same fingerprint, so the exact-match stage can
+    group and compare integers rather than long strings. If the `dcols`
+    are all integer columns, for instance fingerprints persisted with
+    `add_fingerprint`, their values are used as they are.
+
+    Args:
+      dataframe: a dataframe
+      dcols: the columns to check for exact duplicates
+      bits: 64 or 128, the 128-bit fingerprints are two hashes with
+        different keys
+
+    Returns:
+      an int64 array with one row per row and one column per 64 bits
+
+    >>> prints = fingerprint(
+    ...     pd.DataFrame(dict(A=['a', None, 'a', np.nan], B=[1, 1, 1, 1])), ['A', 'B']
+    ... )
+    >>> assert prints.shape == (4, 1)
+    >>> assert prints[0] == prints[2] and prints[1] == prints[3] != prints[0]
+
+    """
+    if bits not in (64, 128):
+        raise ValueError("unknown fingerprint size {0}".format(bits))
+    if dcols and all(
+        pd.api.types.is_integer_dtype(dataframe[col].dtype) for col in dcols
+    ):
+        return dataframe[dcols].values.astype(np.int64)
+    if not dcols:
+        return np.zeros((len(dataframe), 1), dtype=np.int64)
+    return np.column_stack(
+        [
+            pd.util.hash_pandas_object(
+                dataframe[dcols], index=False, hash_key=hash_key
+            ).values.view(np.int64)
+            for hash_key in HASH_KEYS[: bits // 64]
+        ]
+    )
+
+
+def float_columns(dataframe, dcols):
+    """Cast the numeric `dcols` of a dataframe to floats.
+
+    The fingerprints depend on the dtypes, so the same number read as
+    an integer in one dataframe and as a float in another only gets
+    the same fingerprint once both are floats. Booleans are left as
+    they are.
+
+    >>> float_columns(
+    ...     pd.DataFrame(dict(A=[1, 2], B=['a', 'b'], C=[True, False])), ['A', 'B', 'C']
+    ... ).dtypes.tolist()
+    [dtype('float64'), dtype('O'), dtype('bool')]
+
+    """
+    numeric = [
+        col
+        for col in dcols
+        if pd.api.types.is_numeric_dtype(dataframe[col].dtype)
+        and not pd.api.types.is_bool_dtype(dataframe[col].dtype)
+    ]
+    return dataframe[dcols].astype(dict.fromkeys(numeric, float))
+
+
+def fingerprint_columns(bits=64, name="fingerprint"):
+    """The names of the fingerprint columns of `add_fingerprint`.
+
+    >>> fingerprint_columns(128)
+    ['fingerprint_0', 'fingerprint_1']
+
+    """
+    if bits == 64:
+        return [name]
+    return ["{0}_{1}".format(name, i) for i in range(bits // 64)]
+
+
+def add_fingerprint(dataframe, dcols, bits=64, name="fingerprint"):
+    """Add the fingerprints of the `dcols` to a dataframe.
+
+    The fingerprint columns can be persisted with the records and
+    passed as the `dcols` of `duplicates_allclose` in place of the
+    original columns.
+
+    >>> df = add_fingerprint(pd.DataFrame(dict(A=['a', 'b', 'a'])), ['A'])
+    >>> assert df.fingerprint[0] == df.fingerprint[2] != df.fingerprint[1]
+
+    """
+    prints = fingerprint(dataframe, dcols, bits)
+    return dataframe.assign(**dict(zip(fingerprint_columns(bits, name), prints.T)))
+
+
+def fingerprinted(dataframe, dcols, fcols):
+    """Replace the `dcols` of a dataframe by their fingerprints.
+
+    The rows rejected by `matched_rows` also get their own code in an
+    "_unmatched" column, which is compared along with the fingerprints
+    but not sorted on, so they are sorted as their values would be but
+    never match a neighboring row.
+
+    Returns:
+      a dataframe of the fingerprint, "_unmatched" and `fcols` columns,
+      the names of the fingerprint columns, one per column of the
+      fingerprints and none if there are no `dcols`, and the names of
+      the columns to compare
+
+    >>> frame, pcols, ecols = fingerprinted(
+    ...     pd.DataFrame(dict(X=[1, 1, 5], Y=[1, 2, 7], C=[0, 0, 3])),
+    ...     ['X', 'Y'],
+    ...     dict(C=0.1)
+    ... )
+    >>> ecols
+    ['_fingerprint_0', '_fingerprint_1', '_unmatched']
+
+    """
+    if not dcols:
+        return dataframe[list(fcols.keys())], [], []
+    prints = fingerprint(dataframe, dcols)
+    pcols = fingerprint_columns(64 * prints.shape[1], name="_fingerprint")
+    unmatched = np.where(matched_rows(dataframe, dcols), -1, np.arange(len(dataframe)))
+    frame = dataframe[list(fcols.keys())].assign(
+        _unmatched=unmatched, **dict(zip(pcols, prints.T))
+    )
+    return frame, pcols, pcols + ["_unmatched"]
+
+
+def matched_rows(dataframe, dcols):
+    """Select the rows whose `dcols` can be equal to those of another row.
+
+    The fingerprints treat all missing values as equal, but the column
+    comparisons of `find_duplicates_col` only find None equal to None.
+    A row with any other missing value, like a float NaN, is neither a
+    duplicate nor the original of one.
+
+    >>> matched_rows(
+    ...     pd.DataFrame(dict(A=[1.0, np.nan, 1.0], B=['b', 'b', None])), ['A', 'B']
+    ... )
+    array([ True, False,  True])
+
+    """
+    matched = np.ones(len(dataframe), dtype=bool)
+    for col in dcols:
+        values = dataframe[col].values
+        missing = pd.isnull(values)
+        if values.dtype == object:
+            missing &= np.not_equal(values, None)
+        matched &= ~missing
+    return matched
+
+
+def fingerprint_codes(prints):
+    """Label fingerprints by order of first appearance.
+
+    >>> fingerprint_codes(np.array([[5, 1], [3, 1], [5, 1]]))
+    array([0, 1, 0])
+
+    """
+    if prints.shape[1] == 1:
+        return pd.factorize(prints[:, 0])[0]
+    return pd.factorize(np.unique(prints, axis=0, return_inverse=True)[1].reshape(-1))[
+        0
+    ]
+
+
 @curry
-def duplicates_allclose(dataframe, dcols, fcols):
+def duplicates_numpy(dataframe, dcols, fcols):
+    """Determine duplicates in dataframe based on tolerances using NumPy
+
+    Same algorithm and result as the default "sort" method of
+    `duplicates_allclose`, but the sorted rows are compared with
+    `fduplicates_array` rather than column and row wise `apply`.
+
+    >>> random = np.random.RandomState(0)
+    >>> df = pd.DataFrame(
+    ...     dict(
+    ...         A=random.choice(['a', 'b', None], 100),
+    ...         B=random.choice([1, 2], 100),
+    ...         C=random.choice([0.1, 0.2, 0.3], 100),
+    ...         D=random.random_sample(100),
+    ...         E=random.choice([1.0, np.nan], 100)
+    ...     )
+    ... )
+    >>> for dcols in (['A', 'B'], ['A', 'E']):
+    ...     assert np.array_equal(
+    ...         duplicates_numpy(df, dcols=dcols, fcols=dict(C=0.1, D=0.05)),
+    ...         duplicates_allclose(df, dcols=dcols, fcols=dict(C=0.1, D=0.05))
+    ...     )
+
+    """
+    frame, pcols, ecols = stage(
+        "fingerprint", lambda x: fingerprinted(x, dcols, fcols), dataframe
+    )
+    positions = (
+        np.flatnonzero(
+            stage("duplicated", duplicated(subset=pcols, keep=False), frame).values
+        )
+        if pcols
+        else np.arange(len(frame))
+    )
+    subset = frame.iloc[positions].reset_index(drop=True)
+    order = stage(
+        "sort_values", sort_values(by=pcols + list(fcols.keys())), subset
+    ).index.values
+    dups = np.zeros(len(dataframe), dtype=bool)
+    dups[positions[order]] = stage(
+        "fduplicates_array", fduplicates_array(ecols, fcols), subset.iloc[order]
+    )
+    return pd.Series(dups, index=dataframe.index)
+
+
+@curry
+def duplicates_allclose(dataframe, dcols, fcols, method="sort", partitions=None):
     """Determine duplicates in dataframe based on tolerances
 
     Args:
@@ -149,18 +629,28 @@ def duplicates_allclose(dataframe, dcols, fcols):
       dcols: the columns that are tested for exact duplicates
       fcols: the columns that are checked for tolerance, dict with
         tolerances
+      method: either "sort" (the default, described below), "numpy"
+        for the vectorized version of "sort" in `duplicates_numpy` or
+        "grid" to use `duplicates_grid`
+      partitions: if given, the dataframe may also be a CSV or Parquet
+        file or an iterable of records and is processed out of core in
+        that many partitions with `duplicates_partitioned`
 
     This is the similar to `pandas.DataFrame.duplicated` with
     `keep='first'` so only the first duplicate is kept.
 
-    The implementation first uses `pandas.DataFrame.duplicated` on the
-    `dcols` argument with `keep=False` to keep all duplicates. The
-    duplicate sub-dataframe is then sorted on both `dcols` and
-    `fcols`. A diff between each row is then done on the sorted
+    The `dcols` are first reduced to integer fingerprints (see
+    `fingerprint`). The implementation then uses
+    `pandas.DataFrame.duplicated` on the fingerprints with `keep=False`
+    to keep all duplicates. The duplicate sub-dataframe is then sorted
+    on both fingerprints and `fcols`. A diff between each row is then done on the sorted
     duplicates dataframe. The float values are then checked for their
     tolerances. This method may fail is for some edge cases, but
     should in general work well. The edge case will be examined below.
 
+    As with the values themselves, a None in the `dcols` is equal to
+    None but a NaN is not equal to anything (see `matched_rows`).
+
     >>> from toolz.curried import pipe
     >>> npclose = curry(np.allclose)
 
@@ -191,6 +681,36 @@ def duplicates_allclose(dataframe, dcols, fcols):
     ...     npclose([False, False, False, True, True])
     ... )
 
+    Integer `dcols`, like persisted fingerprints, are used as they are
+    but still all have to match
+
+    >>> for method in ("sort", "numpy", "grid"):
+    ...     assert pipe(
+    ...         dict(X=[1, 1, 5], Y=[1, 2, 7], C=[0, 0, 3]),
+    ...         pd.DataFrame,
+    ...         duplicates_allclose(dcols=['X', 'Y'], fcols=dict(C=0.1), method=method),
+    ...         npclose([False, False, False])
+    ...     )
+
+    Rows with a NaN in the `dcols` are never duplicates
+
+    >>> assert pipe(
+    ...     dict(
+    ...         A=[1.0, 1.0, np.nan, np.nan],
+    ...         B=['a', 'a', None, None],
+    ...         C=[1, 1.01, 2, 2]
+    ...     ),
+    ...     pd.DataFrame,
+    ...     duplicates_allclose(dcols=['A', 'B'], fcols=dict(C=0.02)),
+    ...     npclose([False, True, False, False])
+    ... )
+    >>> assert pipe(
+    ...     dict(A=[1.0, 1.0, 1.0], B=['a', None, None], C=[1, 2, 2]),
+    ...     pd.DataFrame,
+    ...     duplicates_allclose(dcols=['A', 'B'], fcols=dict(C=0.02)),
+    ...     npclose([False, False, True])
+    ... )
+
     Issue with multiple duplicates. The current implementation can
     chains duplicates so that
 
@@ -214,18 +734,53 @@ def duplicates_allclose(dataframe, dcols, fcols):
     duplicates of rows that are themselves duplicates. This isn't
     really correct, but is an edge case.
 
+    The "grid" method only compares rows to earlier rows that are
+    kept, so the duplicates do not chain.
+
+    >>> duplicates_allclose(
+    ...     pd.DataFrame(
+    ...         dict(
+    ...             A=[0.1, 0.2, 0.3, 0.4]
+    ...         )
+    ...     ),
+    ...     dcols=[],
+    ...     fcols=dict(A=0.2),
+    ...     method="grid"
+    ... )
+    0    False
+    1     True
+    2     True
+    3    False
+    dtype: bool
+
     """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    if partitions is not None:
+        from duplicates_partitioned import duplicates_partitioned
+
+        return duplicates_partitioned(
+            dataframe, dcols, fcols, method=method, partitions=partitions
+        )
+    if method == "grid":
+        from duplicates_grid import duplicates_grid
+
+        return duplicates_grid(dataframe, dcols, fcols)
+    if method == "numpy":
+        return duplicates_numpy(dataframe, dcols, fcols)
+    if method != "sort":
+        raise ValueError("unknown method {0}".format(method))
 
     alltrue = lambda x: [True] * len(x)
 
+    frame, pcols, ecols = stage(
+        "fingerprint", lambda x: fingerprinted(x, dcols, fcols), dataframe
+    )
     func = sequence(
-        duplicated(subset=dcols, keep=False) if dcols else alltrue,
-        lambda x: dataframe[x],
-        sort_values(by=dcols + list(fcols.keys())),
-        fduplicates(dcols, fcols),
-        pdapply(func=pdall, axis=1),
+        stage("duplicated", duplicated(subset=pcols, keep=False) if pcols else alltrue),
+        stage("mask", lambda x: frame[x]),
+        stage("sort_values", sort_values(by=pcols + list(fcols.keys()))),
+        stage("fduplicates", fduplicates(ecols, fcols)),
+        stage("all", pdapply(func=pdall, axis=1)),
     )
 
-    return (
-        dataframe.assign(duplicates=func(dataframe)).duplicates.fillna(False).rename()
-    )
+    return dataframe.assign(duplicates=func(frame)).duplicates.fillna(False).rename()
@@ -0,0 +1,639 @@
+"""Provides the tolerance grid engine of `duplicates_allclose` and the
+functions built on its close pairs, `duplicate_groups` and
+`duplicates_delta`.
+
+"""
+
+import itertools
+
+from toolz.curried import curry
+import pandas as pd
+import numpy as np
+
+from duplicates import (
+    fingerprint,
+    fingerprint_codes,
+    float_columns,
+    matched_rows,
+    sequence,
+    stage,
+)
+
+
+def group_codes(dataframe, dcols):
+    """Label rows by their exact values in `dcols`.
+
+    Args:
+      dataframe: a dataframe
+      dcols: the columns to check for exact duplicates
+
+    Returns:
+      an integer array with one code per row
+
+    >>> group_codes(
+    ...     pd.DataFrame(dict(A=['a', 'b', 'a', None, None], B=[1, 1, 1, 1, 1])),
+    ...     ['A', 'B']
+    ... )
+    array([0, 1, 0, 2, 2])
+
+    """
+    if not dcols:
+        return np.zeros(len(dataframe), dtype=np.int64)
+    return fingerprint_codes(fingerprint(dataframe, dcols))
+
+
+def grid_cells(values, tolerances):
+    """Bucket float values into grid cells sized by the tolerances.
+
+    Two values within tolerance are at most one cell apart. A zero
+    tolerance buckets by exact value.
+
+    Args:
+      values: a 2-D float array with one column per tolerance
+      tolerances: the absolute tolerances
+
+    Returns:
+      an integer array of cell coordinates with the shape of `values`
+
+    >>> grid_cells(np.array([[0.1, 1.0], [0.3, 2.0], [0.45, 1.0]]), [0.2, 0])
+    array([[0, 0],
+           [1, 1],
+           [2, 0]])
+
+    """
+    cells = np.empty(values.shape, dtype=np.int64)
+    for col, tol in enumerate(tolerances):
+        if tol > 0:
+            cells[:, col] = np.floor(values[:, col] / tol)
+        else:
+            cells[:, col] = np.unique(values[:, col], return_inverse=True)[1]
+    return cells
+
+
+def neighbor_pairs(keys, ngridded):
+    """Join rows whose cell keys are neighbors.
+
+    Args:
+      keys: an integer array of cell keys, one row per record, with
+        the gridded columns last
+      ngridded: the number of gridded columns, the other columns must
+        match exactly
+
+    Returns:
+      the positions of the first and second rows of each pair
+
+    >>> neighbor_pairs(np.array([[0, 0], [0, 1], [0, 3], [1, 1]]), 1)
+    (array([0]), array([1]))
+
+    """
+    right = pd.DataFrame(keys).assign(second=np.arange(len(keys)))
+    start = keys.shape[1] - ngridded
+    first, second = [], []
+    for offset in itertools.product((0, -1, 1), repeat=ngridded):
+        if offset < (0,) * ngridded:
+            continue
+        shift = np.zeros(keys.shape[1], dtype=np.int64)
+        shift[start:] = offset
+        pairs = (
+            pd.DataFrame(keys + shift).assign(first=np.arange(len(keys))).merge(right)
+        )
+        if any(offset):
+            first.append(np.minimum(pairs["first"].values, pairs["second"].values))
+            second.append(np.maximum(pairs["first"].values, pairs["second"].values))
+        else:
+            pairs = pairs[pairs["first"] < pairs["second"]]
+            first.append(pairs["first"].values)
+            second.append(pairs["second"].values)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def close_pairs(dataframe, dcols, fcols, ndims=3):
+    """Find all pairs of rows that are duplicates of each other.
+
+    Rows are bucketed into a grid on at most `ndims` of the `fcols`,
+    choosing the columns that spread the rows over the most cells, and
+    only rows in neighboring cells are compared. The remaining `fcols`
+    are only checked on the candidate pairs. Zero tolerance columns
+    and the `dcols` always have to match exactly, and as in
+    `matched_rows` a row with NaN in the `dcols` matches no other row.
+
+    Args:
+      dataframe: the dataframe
+      dcols: the columns that are tested for exact duplicates
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+      ndims: the maximum number of gridded columns, each one triples
+        the number of neighboring cells
+
+    Returns:
+      the positions of the first and second rows of each pair
+
+    >>> close_pairs(
+    ...     pd.DataFrame(dict(A=[0.0, 0.05, 0.06], B=[0.0, 5.0, 0.01])),
+    ...     dcols=[],
+    ...     fcols=dict(A=0.1, B=0.1)
+    ... )
+    (array([0]), array([2]))
+    >>> close_pairs(
+    ...     pd.DataFrame(dict(A=[1, np.nan, np.nan, 1], C=[1, 1, 1, 1.01])),
+    ...     dcols=['A'],
+    ...     fcols=dict(C=0.1)
+    ... )
+    (array([0]), array([3]))
+
+    """
+    tolerances = np.array(list(fcols.values()), dtype=float)
+    values = dataframe[list(fcols.keys())].values.astype(float)
+    groups = group_codes(dataframe, dcols)
+    index = np.flatnonzero(
+        ~np.isnan(values).any(axis=1) & matched_rows(dataframe, dcols)
+    )
+    values = values[index]
+    cells = grid_cells(values, tolerances)
+
+    spread = [len(np.unique(cells[:, col])) for col in range(len(tolerances))]
+    gridded = sorted(
+        np.flatnonzero(tolerances > 0), key=lambda col: spread[col], reverse=True
+    )[:ndims]
+    exact = list(np.flatnonzero(tolerances == 0))
+
+    first, second = neighbor_pairs(
+        np.column_stack([groups[index]] + [cells[:, col] for col in exact + gridded]),
+        len(gridded),
+    )
+    close = (np.absolute(values[first] - values[second]) <= tolerances).all(axis=1)
+    return index[first[close]], index[second[close]]
+
+
+def keep_first(size, first, second, removed=None):
+    """Resolve pairs of close rows into a keep-first duplicate mask.
+
+    Rows are visited in order and a row is a duplicate only when it is
+    close to an earlier row that is kept, so duplicates do not chain.
+
+    Args:
+      size: the number of rows
+      first: the positions of the earlier row of each pair
+      second: the positions of the later row of each pair
+      removed: a bool array of the rows that are duplicates whatever
+        their pairs, none by default
+
+    Returns:
+      a bool array, True for the rows to be removed
+
+    >>> keep_first(4, np.array([0, 0, 1, 2]), np.array([1, 2, 2, 3]))
+    array([False,  True,  True, False])
+    >>> keep_first(
+    ...     4, np.array([0, 0, 1, 2]), np.array([1, 2, 2, 3]),
+    ...     removed=np.array([True, False, False, False])
+    ... )
+    array([ True, False,  True, False])
+
+    """
+    dups = np.zeros(size, dtype=bool) if removed is None else removed.copy()
+    if len(second) == 0:
+        return dups
+    order = np.lexsort((first, second))
+    first, second = first[order], second[order]
+    bounds = np.flatnonzero(np.diff(second)) + 1
+    for row, earlier in zip(second[np.r_[0, bounds]], np.split(first, bounds)):
+        dups[row] = dups[row] or not dups[earlier].all()
+    return dups
+
+
+@curry
+def duplicates_grid(dataframe, dcols, fcols):
+    """Determine duplicates in dataframe based on tolerances using a grid
+
+    Same arguments and return value as `duplicates_allclose`, but the
+    rows are bucketed into a grid with cells sized by the `fcols`
+    tolerances and only rows in neighboring cells are compared (see
+    `close_pairs`). A row is a duplicate of the first earlier row
+    within tolerance that is not itself a duplicate.
+
+    >>> duplicates_grid(
+    ...     pd.DataFrame(dict(A=[0.1, 0.2, 0.3, 0.4])), dcols=[], fcols=dict(A=0.2)
+    ... )
+    0    False
+    1     True
+    2     True
+    3    False
+    dtype: bool
+    >>> duplicates_grid(
+    ...     pd.DataFrame(dict(A=[1, np.nan, np.nan, 1], C=[1, 1, 1, 1.01])),
+    ...     dcols=['A'],
+    ...     fcols=dict(C=0.1)
+    ... ).values
+    array([False, False, False,  True])
+
+    """
+    if any(tol > 0 for tol in fcols.values()):
+        dups = sequence(
+            stage("close_pairs", lambda x: close_pairs(x, dcols, fcols)),
+            stage("keep_first", lambda x: keep_first(len(dataframe), *x)),
+        )(dataframe)
+    else:
+        groups = stage(
+            "group_codes",
+            lambda x: group_codes(x, dcols + list(fcols.keys())),
+            dataframe,
+        )
+        missing = dataframe[list(fcols.keys())].isnull().any(axis=1).values
+        dups = (
+            pd.Series(groups).duplicated().values
+            & ~missing
+            & matched_rows(dataframe, dcols)
+        )
+    return pd.Series(dups, index=dataframe.index, dtype=bool)
+
+
+def union_find(size, first, second):
+    """Label the connected components of rows linked by pairs.
+
+    The components are merged by hooking the root of each pair onto
+    the smaller root and compressing the paths, for all the pairs at
+    once, until no pair links two components.
+
+    Args:
+      size: the number of rows
+      first: the positions of the first row of each pair
+      second: the positions of the second row of each pair
+
+    Returns:
+      the position of the first row of the component of each row
+
+    >>> union_find(5, np.array([3, 1, 0]), np.array([4, 3, 1]))
+    array([0, 0, 2, 0, 0])
+
+    """
+    labels = np.arange(size)
+    while True:
+        previous = labels.copy()
+        low = np.minimum(labels[first], labels[second])
+        np.minimum.at(labels, labels[first], low)
+        np.minimum.at(labels, labels[second], low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def leaders(size, first, second):
+    """Assign each row to the first earlier kept row it is close to.
+
+    The kept rows are those of `keep_first` and lead their own group.
+
+    Args:
+      size: the number of rows
+      first: the positions of the earlier row of each pair
+      second: the positions of the later row of each pair
+
+    Returns:
+      the position of the leader of each row
+
+    >>> leaders(4, np.array([0, 0, 1, 2]), np.array([1, 2, 2, 3]))
+    array([0, 0, 0, 3])
+
+    """
+    dups = keep_first(size, first, second)
+    led = ~dups[first] & dups[second]
+    leader = np.full(size, size)
+    np.minimum.at(leader, second[led], first[led])
+    return np.where(dups, leader, np.arange(size))
+
+
+def duplicate_groups(dataframe, dcols, fcols, linkage="leader"):
+    """Group the rows of a dataframe that are duplicates of each other
+
+    Rather than a mask of the rows to remove, every row gets a group
+    and a representative, the first row of its group, so a store is
+    collapsed in one pass. The close pairs of rows are found on a grid
+    as in the "grid" method of `duplicates_allclose` and linked into
+    groups by either linkage:
+
+    - "leader": a row joins the group of the first earlier row within
+      tolerance that leads a group, else leads its own group. The
+      representatives are the rows kept by the "grid" method.
+    - "single": the groups are the connected components of the close
+      pairs (see `union_find`), so a chain of rows each within
+      tolerance of the next ends up in one group.
+
+    Args:
+      dataframe: the dataframe
+      dcols: the columns that are tested for exact duplicates
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+      linkage: either "leader" (the default) or "single"
+
+    Returns:
+      a dataframe with the index of `dataframe`, the "group" number of
+      each row, numbered in the order of their first row, and the index
+      label of its "representative"
+
+    >>> df = pd.DataFrame(dict(A=[0.1, 0.2, 0.3, 0.4, 0.42]))
+    >>> duplicate_groups(df, dcols=[], fcols=dict(A=0.15))
+       group  representative
+    0      0               0
+    1      0               0
+    2      1               2
+    3      1               2
+    4      1               2
+    >>> duplicate_groups(df, dcols=[], fcols=dict(A=0.15), linkage="single")
+       group  representative
+    0      0               0
+    1      0               0
+    2      0               0
+    3      0               0
+    4      0               0
+    >>> groups = duplicate_groups(df, dcols=[], fcols=dict(A=0.15))
+    >>> assert np.array_equal(
+    ...     groups.representative != groups.index,
+    ...     duplicates_grid(df, dcols=[], fcols=dict(A=0.15))
+    ... )
+
+    """
+    if linkage not in ("leader", "single"):
+        raise ValueError("unknown linkage {0}".format(linkage))
+    size = len(dataframe)
+    if any(tol > 0 for tol in fcols.values()):
+        first, second = stage(
+            "close_pairs", lambda x: close_pairs(x, dcols, fcols), dataframe
+        )
+        link = leaders if linkage == "leader" else union_find
+        rows = stage(linkage, lambda x: link(size, *x), (first, second))
+    else:
+        groups = stage(
+            "group_codes",
+            lambda x: group_codes(x, dcols + list(fcols.keys())),
+            dataframe,
+        )
+        rows = pd.Series(np.arange(size)).groupby(groups).transform("min").values
+        missing = dataframe[list(fcols.keys())].isnull().any(axis=1).values
+        missing |= ~matched_rows(dataframe, dcols)
+        rows = np.where(missing, np.arange(size), rows)
+    return pd.DataFrame(
+        dict(group=pd.factorize(rows)[0], representative=dataframe.index.values[rows]),
+        index=dataframe.index,
+    )
+
+
+def near_rows(existing, new, fcols):
+    """Select the rows of a frame that may be within tolerance of a row
+    of another frame with the same fingerprint.
+
+    Each tolerance column is bucketed into cells of its tolerance and
+    a row is only kept when one of the rows of `new` with the same
+    fingerprint is in the same or a neighboring cell, for every
+    column. The buckets are looked up in a hash table, so the cost is
+    linear in the rows, and the selection may keep rows that are not
+    within tolerance but never drops one that is.
+
+    Args:
+      existing: a dataframe with a "_fingerprint" column
+      new: another dataframe with a "_fingerprint" column
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+
+    Returns:
+      a bool array, True for the rows of `existing` to keep
+
+    >>> near_rows(
+    ...     pd.DataFrame(dict(_fingerprint=[1, 1, 2], A=[0.0, 1.0, 0.0])),
+    ...     pd.DataFrame(dict(_fingerprint=[1], A=[0.05])),
+    ...     dict(A=0.1)
+    ... )
+    array([ True, False, False])
+
+    """
+    keep = np.isin(existing["_fingerprint"].values, new["_fingerprint"].values)
+    # the fingerprint and the cell are folded into one integer, a
+    # collision only keeps more rows
+    shift = np.int64(1) << np.int64(20)
+    for col, tol in fcols.items():
+        if tol <= 0:
+            continue
+        cells = np.floor(new[col].values / tol)
+        prints = new["_fingerprint"].values[np.isfinite(cells)]
+        cells = cells[np.isfinite(cells)].astype(np.int64)
+        buckets = np.concatenate(
+            [prints * shift + cells + offset for offset in (-1, 0, 1)]
+        )
+        cells = np.floor(existing[col].values[keep] / tol)
+        finite = np.isfinite(cells)
+        folded = existing["_fingerprint"].values[keep] * shift + np.where(
+            finite, cells, 0
+        ).astype(np.int64)
+        keep[keep] = pd.Series(folded).isin(buckets).values & finite
+    return keep
+
+
+def delta_fingerprint(dataframe, other, dcols):
+    """Fingerprint the `dcols` of a dataframe like those of another one.
+
+    The columns with different dtypes in both dataframes are hashed as
+    floats when both are numeric, see `float_columns`, and as objects
+    otherwise, so the same values get the same fingerprint.
+
+    >>> ints = pd.DataFrame(dict(A=[1, 2], B=['a', 'b']))
+    >>> floats = pd.DataFrame(dict(A=[2.0, 1.0], B=['b', 'a']))
+    >>> assert np.array_equal(
+    ...     delta_fingerprint(ints, floats, ['A', 'B']),
+    ...     delta_fingerprint(floats, ints, ['A', 'B'])[::-1],
+    ... )
+
+    """
+    numeric = float_columns(dataframe, dcols).dtypes
+    other_numeric = float_columns(other, dcols).dtypes
+    dataframe = dataframe[dcols].astype(
+        {
+            col: numeric[col] if numeric[col] == other_numeric[col] else object
+            for col in dcols
+            if dataframe[col].dtype != other[col].dtype
+        }
+    )
+    prints = fingerprint(dataframe, dcols)
+    if prints.shape[1] > 1:
+        prints = pd.util.hash_pandas_object(pd.DataFrame(prints), index=False).values
+    return prints.reshape(-1).view(np.int64)
+
+
+def delta_rows(existing, new, dcols, fcols, key):
+    """Select the rows of a store that may match the rows of a new batch.
+
+    Both dataframes get the fingerprints of their `dcols` and the store
+    rows are only kept when `near_rows` finds a new row with the same
+    fingerprint in a neighboring cell.
+
+    As in `matched_rows`, rows with NaN in the `dcols` match no other
+    row: the store rows are dropped and the new rows get their own
+    "_unmatched" position, -1 for the other rows.
+
+    Returns:
+      the selected store rows and the new rows, with the `dcols`, the
+      `fcols`, the `key`, a "_fingerprint" and an "_unmatched" column
+
+    """
+    columns = list(dcols) + list(fcols.keys())
+    prints = stage(
+        "fingerprint",
+        lambda x: [delta_fingerprint(x, new, dcols), delta_fingerprint(new, x, dcols)],
+        existing,
+    )
+    matched = matched_rows(existing, dcols)
+    existing = existing[columns + [key]].assign(_fingerprint=prints[0], _unmatched=-1)
+    new = new[columns + [key]].assign(
+        _fingerprint=prints[1],
+        _unmatched=np.where(matched_rows(new, dcols), -1, np.arange(len(new))),
+    )
+    matching = existing[
+        stage("near_rows", lambda x: near_rows(x, new, fcols) & matched, existing)
+    ]
+    return matching, new
+
+
+def delta_pairs(matching, new, fcols):
+    """Find the pairs of a new row and an earlier row within tolerance.
+
+    Args:
+      matching: the store rows of `delta_rows`
+      new: the new rows of `delta_rows`
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+
+    Returns:
+      the positions of the earlier rows, among the store rows followed
+      by the new rows, and of the new rows, among the new rows
+
+    """
+    size = len(matching)
+    first, second = stage(
+        "close_pairs",
+        lambda x: close_pairs(x, ["_fingerprint", "_unmatched"], fcols),
+        pd.concat([matching, new], ignore_index=True),
+    )
+    later = second >= size
+    return first[later], second[later] - size
+
+
+def delta_keep(size, count, first, second):
+    """Resolve the pairs of `delta_pairs` into a duplicate mask.
+
+    A new row close to a store row is always a duplicate, the others
+    are resolved among the new rows with `keep_first`.
+
+    Args:
+      size: the number of store rows
+      count: the number of new rows
+      first: the positions of the earlier rows
+      second: the positions of the new rows
+
+    Returns:
+      the duplicate masks of the new rows and of the new rows close to
+      a store row
+
+    """
+    of_existing = first < size
+    removed = np.zeros(count, dtype=bool)
+    removed[second[of_existing]] = True
+    dups = stage(
+        "keep_first",
+        lambda x: keep_first(count, *x, removed=removed),
+        (first[~of_existing] - size, second[~of_existing]),
+    )
+    return dups, removed
+
+
+def delta_of(keys, dups, removed, first, second):
+    """List the keys of the rows each duplicate of a new batch is close to.
+
+    These are the store rows or else the earlier kept new rows.
+
+    Args:
+      keys: the keys of the store rows followed by the new rows
+      dups: the duplicate mask of `delta_keep`
+      removed: the mask of the new rows close to a store row
+      first: the positions of the earlier rows
+      second: the positions of the new rows
+
+    Returns:
+      a list of keys for each new row
+
+    """
+    size = len(keys) - len(dups)
+    kept = np.concatenate([np.ones(size, dtype=bool), ~dups])[first]
+    reported = kept & ((first < size) | ~removed[second])
+    of = [[] for _ in range(len(dups))]
+    for row, earlier in zip(second[reported], keys[first[reported]]):
+        if dups[row]:
+            of[row].append(earlier)
+    return of
+
+
+def duplicates_delta(existing, new, dcols, fcols, key="key"):
+    """Determine the duplicates of a new batch against a unique store
+
+    Only the new rows are checked: against the existing rows and
+    against each other, keeping the first of the new rows unless an
+    existing row is within tolerance. The existing rows are only
+    looked at when their `dcols` fingerprint matches a new row, so the
+    tolerance checks scale with the batch and its matching buckets,
+    not with the store. The close pairs are found as in the "grid"
+    method of `duplicates_allclose`.
+
+    Args:
+      existing: the dataframe of the store, already deduplicated
+      new: the dataframe of the new batch
+      dcols: the columns that are tested for exact duplicates
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+      key: the column of the keys reported for the duplicates
+
+    Returns:
+      a dataframe with the index of `new`, whether each new row is a
+      "duplicate" and the keys of the existing rows, or else of the
+      earlier new rows, it is a duplicate "of"
+
+    >>> existing = pd.DataFrame(dict(key=['a', 'b'], A=['x', 'y'], B=[1.0, 2.0]))
+    >>> new = pd.DataFrame(
+    ...     dict(
+    ...         key=['c', 'd', 'e', 'f'],
+    ...         A=['x', 'y', 'y', 'z'],
+    ...         B=[1.01, 3.0, 3.01, 1.0]
+    ...     )
+    ... )
+    >>> duplicates_delta(existing, new, dcols=['A'], fcols=dict(B=0.02))
+       duplicate   of
+    0       True  [a]
+    1      False   []
+    2       True  [d]
+    3      False   []
+    >>> random = np.random.RandomState(0)
+    >>> df = pd.DataFrame(
+    ...     dict(
+    ...         key=range(300),
+    ...         A=random.choice(['a', 'b', None], 300),
+    ...         C=random.random_sample(300),
+    ...         D=random.random_sample(300)
+    ...     )
+    ... )
+    >>> fcols = dict(C=0.05, D=0.1)
+    >>> store, batch = df.iloc[:200], df.iloc[200:]
+    >>> store = store[~duplicates_grid(store, ['A'], fcols).values]
+    >>> assert np.array_equal(
+    ...     duplicates_delta(store, batch, ['A'], fcols).duplicate,
+    ...     duplicates_grid(pd.concat([store, batch]), ['A'], fcols)[len(store):]
+    ... )
+
+    """
+    matching, new = delta_rows(existing, new, dcols, fcols, key)
+    size = len(matching)
+    first, second = delta_pairs(matching, new, fcols)
+    dups, removed = delta_keep(size, len(new), first, second)
+    keys = np.concatenate([matching[key].values, new[key].values])
+    return pd.DataFrame(
+        dict(duplicate=dups, of=delta_of(keys, dups, removed, first, second)),
+        index=new.index,
+    )
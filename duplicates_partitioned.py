@@ -0,0 +1,229 @@
+"""Provides the out of core engine of `duplicates_allclose`,
+`duplicates_partitioned`.
+
+"""
+
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+from multiprocessing import Pool
+
+import pandas as pd
+import numpy as np
+
+from duplicates import duplicates_allclose, fingerprint, float_columns, stage
+
+
+def read_chunks(source, chunksize):
+    """Read a source of records in dataframe chunks.
+
+    Args:
+      source: a dataframe, the path of a CSV or Parquet file or an
+        iterable of record dicts
+      chunksize: the number of rows per chunk
+
+    Returns:
+      an iterator of dataframes
+
+    >>> [len(chunk) for chunk in read_chunks([dict(A=1)] * 5, 2)]
+    [2, 2, 1]
+
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            stop = start + chunksize
+            yield source.iloc[start:stop]
+    elif isinstance(source, str) and source.endswith(".parquet"):
+        # pylint: disable=import-outside-toplevel,import-error
+        import pyarrow.parquet
+
+        for batch in pyarrow.parquet.ParquetFile(source).iter_batches(chunksize):
+            yield batch.to_pandas()
+    elif isinstance(source, str):
+        yield from pd.read_csv(source, chunksize=chunksize)
+    else:
+        records = iter(source)
+        while True:
+            chunk = list(itertools.islice(records, chunksize))
+            if not chunk:
+                return
+            yield pd.DataFrame(chunk)
+
+
+def partition_codes(dataframe, dcols, partitions):
+    """Hash the `dcols` of each row into a partition number.
+
+    Rows that are exact duplicates on the `dcols` always fall in the
+    same partition. The numeric columns are hashed as floats, so the
+    same number falls in the same partition whether its chunk was read
+    as integers or as floats.
+
+    >>> df = pd.DataFrame(dict(A=['a', 'b', 'a', None], B=[1, 2, 1, 2]))
+    >>> codes = partition_codes(df, ['A', 'B'], 4)
+    >>> assert codes[0] == codes[2] and codes.max() < 4
+    >>> assert np.array_equal(
+    ...     codes, partition_codes(df.astype(dict(B=float)), ['A', 'B'], 4)
+    ... )
+
+    """
+    values = float_columns(dataframe, dcols).astype(object)
+    hashes = fingerprint(values, dcols)[:, 0].view(np.uint64)
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+
+def spill_chunk(chunk, dcols, paths):
+    """Append the rows of a chunk to the partition files of their `dcols`.
+
+    Args:
+      chunk: a dataframe
+      dcols: the columns that are tested for exact duplicates
+      paths: the paths of the partition files
+
+    Returns:
+      the partition number of each row
+
+    """
+    codes = partition_codes(chunk, dcols, len(paths))
+    for code in np.unique(codes):
+        with open(paths[code], "ab") as file_:
+            pickle.dump(chunk[codes == code], file_)
+    return codes
+
+
+def spill(chunks, dcols, partitions, directory):
+    """Spill dataframe chunks to partition files by a hash of the `dcols`.
+
+    The rows are indexed by their row number in the whole source. Each
+    chunk is profiled as a "read" and a "spill" stage, so the stages
+    count the rows of the chunks.
+
+    Args:
+      chunks: an iterator of dataframes
+      dcols: the columns that are tested for exact duplicates
+      partitions: the number of partitions
+      directory: where to write the partition files
+
+    Returns:
+      the paths of the partition files and the total number of rows
+
+    """
+    chunks = iter(chunks)
+    paths = [os.path.join(directory, str(i)) for i in range(partitions)]
+    size = 0
+    while True:
+        chunk = stage("read", lambda x: next(x, None), chunks)
+        if chunk is None:
+            break
+        chunk = chunk.set_axis(np.arange(size, size + len(chunk)), axis=0)
+        size += len(chunk)
+        stage("spill", lambda x: spill_chunk(x, dcols, paths), chunk)
+    return [path for path in paths if os.path.exists(path)], size
+
+
+def partition_duplicates(path, dcols, fcols, method):
+    """Find the duplicates of a partition spilled to disk.
+
+    Args:
+      path: the file with the pickled chunks of the partition
+      dcols: the columns that are tested for exact duplicates
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+      method: the `duplicates_allclose` method
+
+    Returns:
+      the row numbers of the duplicates
+
+    """
+    chunks = []
+    with open(path, "rb") as file_:
+        while True:
+            try:
+                chunks.append(pickle.load(file_))
+            except EOFError:
+                break
+    dataframe = pd.concat(chunks, sort=False).sort_index()
+    dups = duplicates_allclose(dataframe, dcols, fcols, method=method)
+    return dataframe.index.values[dups.values.astype(bool)]
+
+
+def duplicates_partitioned(  # pylint: disable=too-many-arguments
+    source,
+    dcols,
+    fcols,
+    method="grid",
+    partitions=16,
+    chunksize=100000,
+    processes=None,
+):
+    """Determine duplicates out of core based on tolerances
+
+    Rows can only be duplicates when their `dcols` match, so the
+    source is streamed in chunks and each row is spilled to a
+    partition file chosen by a hash of its `dcols`. The partitions are
+    then processed with `duplicates_allclose` on a process pool and
+    the results merged back in a keep-first mask. Only one partition
+    per process needs to fit in memory, plus the mask itself.
+
+    Args:
+      source: a dataframe, the path of a CSV or Parquet file or an
+        iterable of record dicts
+      dcols: the columns that are tested for exact duplicates
+      fcols: the columns that are checked for tolerance, dict with
+        tolerances
+      method: the `duplicates_allclose` method of each partition
+      partitions: the number of partitions
+      chunksize: the number of rows read at once
+      processes: the number of processes, 1 to stay in this process
+
+    Returns:
+      a bool series with one value per row of the source
+
+    >>> duplicates_partitioned(
+    ...     iter([
+    ...         dict(A='c', B='a', C=1),
+    ...         dict(A='c', B='a', C=1.01),
+    ...         dict(A='e', B='c', C=2),
+    ...         dict(A='d', B='a', C=3),
+    ...         dict(A='d', B='a', C=3.01)
+    ...     ]),
+    ...     dcols=['A', 'B'],
+    ...     fcols=dict(C=0.02),
+    ...     partitions=2,
+    ...     chunksize=2,
+    ...     processes=1
+    ... )
+    0    False
+    1     True
+    2    False
+    3    False
+    4     True
+    dtype: bool
+
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        paths, size = spill(
+            read_chunks(source, chunksize), dcols, partitions, directory
+        )
+        args = [(path, dcols, fcols, method) for path in paths]
+        if processes == 1:
+            rows = stage(
+                "partitions",
+                lambda x: list(itertools.starmap(partition_duplicates, x)),
+                args,
+            )
+        else:
+            with Pool(processes) as pool:
+                rows = stage(
+                    "partitions", lambda x: pool.starmap(partition_duplicates, x), args
+                )
+    finally:
+        shutil.rmtree(directory)
+
+    dups = np.zeros(size, dtype=bool)
+    dups[np.concatenate([np.zeros(0, dtype=np.int64)] + rows)] = True
+    return pd.Series(
+        dups, index=source.index if isinstance(source, pd.DataFrame) else None
+    )
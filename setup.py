@@ -30,6 +30,7 @@ setup(name=PACKAGE_NAME,
         "Programming Language :: Python",
       ],
       packages=find_packages(),
+      py_modules=['duplicates', 'duplicates_grid', 'duplicates_partitioned'],
       entry_points={
         'console_scripts': [
             'simy = simy.main.cli:handle',
@@ -1 +1,3 @@
-from . import record
\ No newline at end of file
+# The subpackages are not imported here, simy.record pulls in numpy,
+# DataModelDict, atomman and iprPy which take seconds to import. Import them
+# explicitly where they are used, e.g. `from simy.record import ...`.
@@ -0,0 +1,2 @@
+from .generate import generate
+from .run import run, compare
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from ..record import CalculationRelaxStatic
+
+def generate(rows, duplicate_rate=0.1, noise=0.5, cardinality=10, seed=0):
+    """generates a DataFrame of synthetic CalculationRelaxStatic flat records.
+
+    A duplicate_rate fraction of the rows are copies of other rows with their
+    compare_fterms moved by at most noise times their tolerance, so they are
+    duplicates as long as noise is below 1. The cardinality is the number of
+    distinct values of the exact comparison terms like the potential and the
+    system family.
+    """
+    random = np.random.RandomState(seed)
+    record = CalculationRelaxStatic(None, None)
+    originals = max(1, int(round(rows * (1 - duplicate_rate))))
+
+    def labels(prefix, codes=None):
+        codes = random.randint(0, cardinality, originals) if codes is None else codes
+        return np.array(['{0}-{1}'.format(prefix, i) for i in range(cardinality)])[codes]
+
+    potentials = random.randint(0, cardinality, originals)
+    symbols = labels('symbol')
+    frame = pd.DataFrame(dict(
+        script='calc_relax_static',
+        atomman_version='1.2.4',
+        iprPy_version='0.8.3',
+        LAMMPS_version='22 Aug 2018',
+        a_mult1=0, a_mult2=random.randint(1, 4, originals),
+        b_mult1=0, b_mult2=random.randint(1, 4, originals),
+        c_mult1=0, c_mult2=random.randint(1, 4, originals),
+        min_etol=0.0, min_ftol=1e-10, min_maxiter=10000, min_maxeval=100000, min_dmax=0.01,
+        potential_LAMMPS_key=labels('potential-LAMMPS-key', potentials),
+        potential_LAMMPS_id=labels('potential-LAMMPS-id', potentials),
+        potential_key=labels('potential-key', potentials),
+        potential_id=labels('potential-id', potentials),
+        load_file=labels('load-file'), load_style='atom_dump', load_options=None,
+        family=labels('family'), symbols=symbols,
+        temperature=random.uniform(0, 1000, originals),
+        pressure_xx=random.normal(0, 1, originals), pressure_yy=random.normal(0, 1, originals),
+        pressure_zz=random.normal(0, 1, originals), pressure_xy=0.0, pressure_xz=0.0, pressure_yz=0.0,
+        status='finished', error=np.nan,
+        initial_load_file='initial.dump', initial_load_style='atom_dump', initial_load_options=None,
+        initial_symbols=symbols,
+        final_load_file='relax_static-1.dump', final_load_style='atom_dump', final_load_options=None,
+        final_symbols=symbols,
+        lx=random.uniform(3, 50, originals), ly=random.uniform(3, 50, originals),
+        lz=random.uniform(3, 50, originals), xy=0.0, xz=0.0, yz=0.0,
+        E_cohesive=random.uniform(-8, -1, originals),
+        measured_temperature=0.0,
+        measured_pressure_xx=random.normal(0, 1e-8, originals),
+        measured_pressure_yy=random.normal(0, 1e-8, originals),
+        measured_pressure_zz=random.normal(0, 1e-8, originals),
+        measured_pressure_xy=0.0, measured_pressure_xz=0.0, measured_pressure_yz=0.0,
+    ))
+
+    copies = frame.iloc[random.randint(0, originals, rows - originals)].copy()
+    for col, tolerance in record.compare_fterms.items():
+        copies[col] += random.uniform(-noise, noise, len(copies)) * tolerance
+
+    frame = pd.concat([frame, copies]).iloc[random.permutation(rows)].reset_index(drop=True)
+    frame.insert(0, 'key', ['{0:032x}'.format(i) for i in range(rows)])
+    return frame
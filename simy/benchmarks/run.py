@@ -0,0 +1,75 @@
+import json
+import platform
+import time
+
+from duplicates import duplicates_allclose, profiled, stage
+
+from ..features import reshape_feature
+from ..record import CalculationRelaxStatic
+from .generate import generate
+
+def measure(name, rows, func, *args, **kwargs):
+    """runs func and returns its wall time and, from a second traced run, its
+    peak memory, as tracing slows down the allocations.
+    """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    with profiled() as stages:
+        stage(name, lambda _: func(*args, **kwargs), None)
+    peak = stages[-1]['peak_bytes']
+
+    return dict(name=name, rows=rows, seconds=seconds, peak_bytes=peak)
+
+def run(sizes=(1000, 10000), records=1000, methods=('sort', 'numpy', 'grid'),
+        duplicate_rate=0.1, noise=0.5, cardinality=10, seed=0):
+    """benchmarks duplicates_allclose on generated stores of each size and
+    the per record reshape, XML parsing and flattening on a number of
+    generated records.
+    """
+    record = CalculationRelaxStatic(None, None)
+    results = []
+
+    for size in sizes:
+        frame = generate(size, duplicate_rate, noise, cardinality, seed)
+        for method in methods:
+            results.append(measure(
+                'duplicates_allclose.{0}'.format(method), size, duplicates_allclose,
+                frame, record.compare_terms, record.compare_fterms, method=method))
+
+    frame = generate(records, duplicate_rate, noise, cardinality, seed)
+    models = [record.dicttomodel(params) for params in frame.to_dict('records')]
+    sources = [json.loads(model.json()) for model in models]
+    xmls = [model.xml() for model in models]
+
+    results.append(measure(
+        'reshape_feature.reshape', records,
+        lambda: [reshape_feature.reshape(source) for source in sources]))
+    results.append(measure(
+        'CalculationRelaxStatic.xml', records,
+        lambda: [CalculationRelaxStatic(None, xml).model for xml in xmls]))
+    results.append(measure(
+        'CalculationRelaxStatic.modeltodict', records,
+        lambda: [record.modeltodict(model) for model in models]))
+    results.append(measure(
+        'CalculationRelaxStatic.modelstodicts', records, record.modelstodicts, models))
+
+    return dict(
+        python=platform.python_version(),
+        machine=platform.machine(),
+        parameters=dict(duplicate_rate=duplicate_rate, noise=noise,
+                        cardinality=cardinality, seed=seed),
+        results=results)
+
+def compare(report, baseline, threshold=0.2):
+    """returns the results of a report that are slower than the same
+    benchmark of a baseline report by more than a threshold fraction.
+    """
+    reference = dict(((result['name'], result['rows']), result) for result in baseline['results'])
+    regressions = []
+    for result in report['results']:
+        base = reference.get((result['name'], result['rows']))
+        if base is not None and result['seconds'] > base['seconds'] * (1 + threshold):
+            regressions.append(dict(result, baseline_seconds=base['seconds']))
+    return regressions
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+from duplicates import stage
+
+from ..record import CalculationRelaxStatic
+
+MANIFEST = 'manifest.json'
+BUFFER = 1 << 20
+
+def render(params, fmt='xml', units=None):
+    """the xml or json text of the model of a flat dictionary.
+    """
+    model = CalculationRelaxStatic(None, None).dicttomodel(params, **(units or {}))
+    if fmt == 'xml':
+        return model.xml()
+    if fmt == 'json':
+        return model.json()
+    raise ValueError("unknown format {0}".format(fmt))
+
+def digest(params, fmt, units):
+    """the digest of a flat dictionary and of the way it is rendered, the
+    same as long as the rendered record is.
+    """
+    content = repr((sorted(params.items()), fmt, sorted((units or {}).items())))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def render_batch(job):
+    """renders a batch of flat dictionaries, job being the rows, the format,
+    the units, the directory, the digests of the previous export and the key
+    column. With a directory, each record is written to its own file unless
+    its digest and file are unchanged, and the text is not returned.
+    Returns the key, digest and text of each record.
+    """
+    rows, fmt, units, directory, digests, key = job
+    rendered = []
+    for params in rows:
+        name, row_digest = params[key], digest(params, fmt, units)
+        if directory is None:
+            rendered.append((name, row_digest, render(params, fmt, units)))
+            continue
+
+        path = os.path.join(directory, '{0}.{1}'.format(name, fmt))
+        if digests.get(name) != row_digest or not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as record_f:
+                record_f.write(render(params, fmt, units))
+        rendered.append((name, row_digest, None))
+    return rendered
+
+def batches(frame, size):
+    """the flat dictionaries of the rows of a DataFrame by batches.
+    """
+    for start in range(0, len(frame), size):
+        yield frame.iloc[start:start + size].to_dict('records')
+
+def export(frame, directory=None, out=None, fmt='xml', processes=None, batch=64,
+           unchanged=False, units=None, key='key'):
+    """exports the rows of a DataFrame of flat dictionaries as records built
+    with dicttomodel, either one file per record named after its key in
+    directory, or all the records in the single file out, one json record per
+    line or the xml documents one after the other, as stream_feature reads
+    them.
+
+    The records are rendered by batches on a process pool unless a single
+    process is requested. The workers write the record files themselves, the
+    single file is written in order through a large buffer. With unchanged,
+    the rows whose digest is the one recorded in the manifest of the directory
+    by the previous export and whose file is still there are neither rendered
+    nor written again.
+
+    Returns the number of records exported.
+    """
+    if (directory is None) == (out is None):
+        raise ValueError("either a directory or an out file is needed")
+
+    digests = {}
+    if directory:
+        manifest = os.path.join(directory, MANIFEST)
+        os.makedirs(directory, exist_ok=True)
+        if unchanged and os.path.exists(manifest):
+            with open(manifest, 'r') as manifest_f:
+                digests = json.load(manifest_f)
+
+    found = {}
+
+    def write(frame):
+        jobs = ((rows, fmt, units, directory, {row[key]: digests.get(row[key]) for row in rows}, key)
+                for rows in batches(frame, batch))
+        out_f = open(out, 'w', encoding='utf-8', buffering=BUFFER) if out else None
+        pool = None if processes == 1 else Pool(processes)
+        try:
+            for rendered in map(render_batch, jobs) if pool is None else pool.imap(render_batch, jobs):
+                for name, row_digest, text in rendered:
+                    found[name] = row_digest
+                    if out_f is not None:
+                        out_f.write(text if fmt == 'xml' else text + '\n')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if out_f is not None:
+                out_f.close()
+        return found
+
+    stage('export.render', write, frame)
+    if directory:
+        with open(manifest, 'w') as manifest_f:
+            json.dump(found, manifest_f)
+    return len(frame)
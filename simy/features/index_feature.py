@@ -0,0 +1,115 @@
+import pickle
+
+import numpy as np
+
+def exact(value):
+    """normalizes a value compared for exact match so that all the missing
+    values fall in the same bucket.
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value
+
+class SimilarityIndex(object):
+    """an index of records for similarity checks. The records are hashed on
+    their dcols values into buckets of exact matches and, in each bucket, the
+    fcols values are kept sorted on the first fcol so that a check only looks
+    at the records within tolerance of that first fcol.
+    """
+
+    def __init__(self, dcols, fcols):
+        self.dcols = list(dcols)
+        self.fcols = dict(fcols)
+        self.tolerances = np.array(list(self.fcols.values()), dtype=float)
+        self.buckets = {}
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.buckets.values())
+
+    def bucket(self, record):
+        """the bucket key of a record.
+        """
+        return tuple(exact(record[col]) for col in self.dcols)
+
+    def values(self, record):
+        """the fcols values of a record.
+        """
+        return np.array([record[col] for col in self.fcols], dtype=float)
+
+    def insert(self, key, record):
+        """adds a record to the index without rebuilding it. Records with
+        missing fcols values can never be similar and are not indexed.
+        """
+        values = self.values(record)
+        if np.isnan(values).any():
+            return
+
+        bucket = self.bucket(record)
+        keys, array = self.buckets.get(bucket, ([], np.zeros((0, len(values)))))
+        position = np.searchsorted(array[:, 0], values[0], side='right') if len(values) else len(keys)
+        keys.insert(position, key)
+        self.buckets[bucket] = (keys, np.insert(array, position, values, axis=0))
+
+    def remove(self, key, bucket):
+        """removes the record of a key from its bucket, as given by bucket,
+        if it is indexed.
+        """
+        keys, array = self.buckets.get(bucket, ([], None))
+        if key not in keys:
+            return
+        position = keys.index(key)
+        del keys[position]
+        if keys:
+            self.buckets[bucket] = (keys, np.delete(array, position, axis=0))
+        else:
+            del self.buckets[bucket]
+
+    def check(self, record):
+        """returns the keys of the indexed records similar to a record.
+        """
+        values = self.values(record)
+        keys, array = self.buckets.get(self.bucket(record), ([], None))
+        if not keys or np.isnan(values).any():
+            return []
+        if len(values) == 0:
+            return list(keys)
+
+        column, tolerance = array[:, 0], self.tolerances[0]
+        start = np.searchsorted(column, np.nextafter(values[0] - tolerance, -np.inf), side='left')
+        stop = np.searchsorted(column, np.nextafter(values[0] + tolerance, np.inf), side='right')
+        close = (np.absolute(array[start:stop] - values) <= self.tolerances).all(axis=1)
+        return [keys[start + i] for i in np.flatnonzero(close)]
+
+    def save(self, path):
+        """persists the index in a file.
+        """
+        with open(path, 'wb') as index_f:
+            pickle.dump(self, index_f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """loads an index persisted with save.
+        """
+        with open(path, 'rb') as index_f:
+            return pickle.load(index_f)
+
+    @classmethod
+    def build(cls, frame, dcols, fcols, key='key'):
+        """builds the index of all the records of a DataFrame at once.
+        """
+        index = cls(dcols, fcols)
+        frame = frame[~frame[list(fcols)].isnull().any(axis=1)]
+        columns = [[exact(value) for value in frame[col].tolist()] for col in dcols]
+
+        buckets = {}
+        for position, bucket in enumerate(zip(*columns) if dcols else [()] * len(frame)):
+            buckets.setdefault(bucket, []).append(position)
+
+        for bucket, positions in buckets.items():
+            group = frame.iloc[positions]
+            if fcols:
+                group = group.sort_values(list(fcols)[0], kind='mergesort')
+            array = group[list(fcols)].values.astype(float).reshape(len(group), len(fcols))
+            index.buckets[bucket] = (list(group[key]), array)
+
+        return index
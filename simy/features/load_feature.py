@@ -0,0 +1,81 @@
+import glob
+import itertools
+import os
+from multiprocessing import Pool
+
+import pandas as pd
+
+from duplicates import stage
+
+from ..record import CalculationRelaxStatic
+from . import stream_feature
+
+CACHE_COLUMNS = ['path', 'mtime', 'size']
+
+def parse(path):
+    """parses the records of a file of the store, a single record or a dump
+    of many, into their flat dictionaries. The file is streamed into flat
+    records without building their data models.
+    """
+    record = CalculationRelaxStatic(None, None)
+    return record.flatstodicts(list(stream_feature.iterrecords(path)))
+
+def iterdicts(directory, pattern="*.xml", batch=10000):
+    """yields the flat dictionaries of all the records of a store directory,
+    file by file and batch by batch, so that only one batch of records is held
+    in memory at a time.
+    """
+    record = CalculationRelaxStatic(None, None)
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        records = stream_feature.iterrecords(path)
+        while True:
+            flats = list(itertools.islice(records, batch))
+            if not flats:
+                break
+            yield from record.flatstodicts(flats)
+
+def parse_all(paths, processes=None):
+    """parses many record files, on a process pool unless a single process
+    is requested.
+    """
+    if processes == 1 or len(paths) < 2:
+        return [parse(path) for path in paths]
+
+    with Pool(processes) as pool:
+        return pool.map(parse, paths)
+
+def load(directory, cache=None, processes=None, pattern="*.xml"):
+    """loads all the records of a store directory in a DataFrame with one row
+    per record and one column per flat dictionary key. A file may hold a dump
+    of many records.
+
+    The parsed rows are kept in a cache file keyed on the file path, mtime and
+    size so that only new or modified files are parsed again on the next load.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    stats = stage('load.stat', lambda paths: pd.DataFrame(
+        [(path, os.stat(path).st_mtime, os.stat(path).st_size) for path in paths],
+        columns=CACHE_COLUMNS), paths)
+
+    if cache and os.path.exists(cache):
+        cached = pd.read_pickle(cache).merge(stats, on=CACHE_COLUMNS)
+    else:
+        cached = pd.DataFrame(columns=CACHE_COLUMNS)
+
+    todo = stats[~stats.path.isin(cached.path)]
+    parsed = stage('load.parse', lambda paths: parse_all(paths, processes), list(todo.path))
+    rows = [dict(params, path=path) for path, records in zip(todo.path, parsed) for params in records]
+    parsed = todo.merge(pd.DataFrame(rows), on='path') if rows else todo
+
+    if len(cached) == 0:
+        frame = parsed
+    elif len(parsed) == 0:
+        frame = cached
+    else:
+        frame = pd.concat([cached, parsed], sort=False)
+    frame = frame.sort_values('path', kind='mergesort').reset_index(drop=True)
+
+    if cache:
+        frame.to_pickle(cache)
+
+    return frame.drop(columns=CACHE_COLUMNS)
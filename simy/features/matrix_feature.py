@@ -0,0 +1,118 @@
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from duplicates import duplicates_allclose, fingerprint, stage
+
+FEATURES = 'features.npy'
+FINGERPRINTS = 'fingerprints.npy'
+META = 'meta.json'
+
+def partition_duplicates(directory, positions, fcols, method):
+    """finds the duplicates among some rows of a feature matrix opened in
+    this process, returns the positions of the duplicates.
+    """
+    matrix = FeatureMatrix(directory)
+    dups = matrix.duplicates(fcols, method, positions=positions)
+    return positions[dups.values]
+
+class FeatureMatrix(object):
+    """the fcols of the records of a store persisted in a directory as a
+    float64 matrix, with the fingerprints of their dcols and the keys and
+    columns of the rows as metadata. The arrays are opened with np.memmap so
+    that the rows are only read when used and that the processes opening the
+    same directory share the same pages instead of parsing the records again.
+    """
+
+    def __init__(self, directory, mode='r'):
+        self.directory = directory
+        with open(os.path.join(directory, META), 'r') as meta_f:
+            meta = json.load(meta_f)
+        self.keys = meta['keys']
+        self.dcols = meta['dcols']
+        self.fcols = dict(zip(meta['columns'], meta['tolerances']))
+        self.values = np.load(os.path.join(directory, FEATURES), mmap_mode=mode)
+        self.fingerprints = np.load(os.path.join(directory, FINGERPRINTS), mmap_mode=mode)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def pcols(self):
+        """the names of the fingerprint columns of frame.
+        """
+        return ['_fingerprint{0}'.format(i) for i in range(self.fingerprints.shape[1])]
+
+    def frame(self, positions=None):
+        """the fcols and the fingerprint columns of the rows at positions, all
+        of them by default, as a DataFrame. The DataFrame of all the rows is
+        built over the mapped arrays without copying them.
+        """
+        values, prints = self.values, self.fingerprints
+        if positions is not None:
+            values, prints = values[positions], prints[positions]
+        return pd.concat([
+            pd.DataFrame(values, columns=list(self.fcols), copy=False),
+            pd.DataFrame(prints, columns=self.pcols, copy=False),
+        ], axis=1, copy=False)
+
+    def duplicates(self, fcols=None, method='numpy', positions=None):
+        """the keep-first duplicates mask of the rows at positions, all of
+        them by default, indexed by their keys, with the tolerances of the
+        matrix unless other fcols tolerances are given.
+        """
+        fcols = self.fcols if fcols is None else dict(fcols)
+        dups = duplicates_allclose(self.frame(positions), self.pcols, fcols, method=method)
+        keys = self.keys if positions is None else [self.keys[i] for i in positions]
+        return pd.Series(dups.values.astype(bool), index=keys)
+
+    def duplicates_parallel(self, fcols=None, method='numpy', partitions=16, processes=None):
+        """same as duplicates with the rows split in partitions on their
+        fingerprints, each partition being processed by a worker process that
+        maps the matrix, the mask being indexed by the keys of the rows.
+        """
+        fcols = self.fcols if fcols is None else dict(fcols)
+        codes = self.fingerprints[:, 0].view(np.uint64) % np.uint64(partitions)
+        args = [(self.directory, np.flatnonzero(codes == code), fcols, method)
+                for code in np.unique(codes)]
+        with Pool(processes) as pool:
+            rows = stage('matrix.partitions', lambda x: pool.starmap(partition_duplicates, x), args)
+
+        dups = np.zeros(len(self), dtype=bool)
+        dups[np.concatenate([np.zeros(0, dtype=np.int64)] + rows)] = True
+        return pd.Series(dups, index=self.keys)
+
+    @classmethod
+    def write(cls, directory, frame, dcols, fcols, key='key', chunksize=100000):
+        """writes the matrix of the records of a DataFrame by chunks of rows
+        and opens it. The metadata is written last so that an interrupted
+        write is not mistaken for a matrix.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, META)):
+            os.remove(os.path.join(directory, META))
+
+        columns = list(fcols)
+        width = fingerprint(frame.iloc[:0], list(dcols)).shape[1]
+        values = np.lib.format.open_memmap(
+            os.path.join(directory, FEATURES), mode='w+', dtype=np.float64,
+            shape=(len(frame), len(columns)))
+        prints = np.lib.format.open_memmap(
+            os.path.join(directory, FINGERPRINTS), mode='w+', dtype=np.int64,
+            shape=(len(frame), width))
+        for start in range(0, len(frame), chunksize):
+            chunk = frame.iloc[start:start + chunksize]
+            values[start:start + len(chunk)] = chunk[columns].values.astype(np.float64)
+            prints[start:start + len(chunk)] = fingerprint(chunk, list(dcols))
+        values.flush()
+        prints.flush()
+        del values, prints
+
+        meta = dict(keys=[str(value) for value in frame[key]], dcols=list(dcols),
+                    columns=columns, tolerances=[fcols[col] for col in columns])
+        with open(os.path.join(directory, META), 'w') as meta_f:
+            json.dump(meta, meta_f)
+        return cls(directory)
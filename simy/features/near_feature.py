@@ -0,0 +1,136 @@
+import fnmatch
+import math
+import numbers
+import re
+
+import numpy as np
+import pandas as pd
+
+from duplicates_grid import close_pairs
+
+def pattern(patterns):
+    """a regular expression matching the keys matched by any of many glob
+    patterns.
+    """
+    return re.compile('|'.join('(?:{0})'.format(fnmatch.translate(item)) for item in patterns) or '(?!)')
+
+class Comparison(object):
+    """compares the dotted key/value pairs of flat records, as given by
+    reshape_feature.reshape or stream_feature, of any record type. The numeric
+    values of the keys matching a tolerance pattern are compared within their
+    tolerance and the other values exactly. The keys matching an ignore
+    pattern and the key of the root element named key, the record key, are
+    left out, not the keys of the same name deeper in the record.
+    """
+
+    def __init__(self, tolerances=None, ignore=(), key=None):
+        self.ignored = pattern(ignore)
+        self.root = re.compile(r'[^.]*\.{0}\Z'.format(re.escape(key))) if key else None
+        self.compiled = [(re.compile(fnmatch.translate(key)), tolerance)
+                         for key, tolerance in (tolerances or {}).items()]
+        self.cache = {}
+
+    def tolerance(self, key):
+        """the tolerance of a key, None if it is compared exactly, False if it
+        is ignored. The first matching pattern wins.
+        """
+        if key not in self.cache:
+            if self.ignored.match(key) or (self.root and self.root.match(key)):
+                self.cache[key] = False
+            else:
+                self.cache[key] = next(
+                    (tolerance for regex, tolerance in self.compiled if regex.match(key)), None)
+        return self.cache[key]
+
+    def split(self, flat):
+        """the exact part of a flat record, the sorted key/value pairs without
+        a tolerance and the keys with one, and its numeric part, the values of
+        the keys with a tolerance.
+        """
+        exact, numeric = [], {}
+        for key, value in flat.items():
+            tolerance = self.tolerance(key)
+            if tolerance is False:
+                continue
+            if (tolerance and isinstance(value, numbers.Real) and not isinstance(value, bool)
+                    and math.isfinite(value)):
+                numeric[key] = value
+                exact.append((key, None))
+            else:
+                exact.append((key, repr(value)))
+        return tuple(sorted(exact)), numeric
+
+    def close(self, first, second):
+        """true if the numeric parts of two records with the same exact part
+        are within tolerance.
+        """
+        return all(abs(value - second[key]) <= self.tolerance(key) for key, value in first.items())
+
+    def similar(self, first, second):
+        """verifies that two flat records have the same keys, that their
+        values with a tolerance are within it and that the others are equal,
+        nan being equal to nan.
+        """
+        (exact, numeric), (other_exact, other_numeric) = self.split(first), self.split(second)
+        return exact == other_exact and self.close(numeric, other_numeric)
+
+def near_duplicates(records, tolerances=None, ignore=(), key=None):
+    """the pairs of near duplicate flat records of any record type, as the
+    positions of the first and second record of each pair, ordered.
+
+    Two records can only be similar, as Comparison.similar verifies, when their
+    exact parts are equal, so the records are bucketed on their exact part and
+    the values with a tolerance are only compared within a bucket, on a grid
+    of cells of their tolerances as close_pairs does. Every pair of similar
+    records is found, whatever the number of keys of the records.
+    """
+    records = list(records)
+    comparison = Comparison(tolerances, ignore, key)
+    buckets, shapes = {}, {}
+    numerics = []
+    for row, record in enumerate(records):
+        exact, numeric = comparison.split(record)
+        bucket = buckets.setdefault(exact, len(buckets))
+        # the buckets with the same keys with a tolerance are compared at once
+        shapes.setdefault(tuple(sorted(numeric)), []).append((row, bucket))
+        numerics.append(numeric)
+
+    firsts, seconds = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for keys, rows in shapes.items():
+        positions = np.array([row for row, _ in rows], dtype=np.int64)
+        frame = pd.DataFrame([[numerics[row][key] for key in keys] for row in positions],
+                             columns=list(keys), dtype=float).assign(_bucket=[bucket for _, bucket in rows])
+        first, second = close_pairs(frame, ['_bucket'], {key: comparison.tolerance(key) for key in keys})
+        firsts.append(positions[first])
+        seconds.append(positions[second])
+
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    order = np.lexsort((second, first))
+    return first[order], second[order]
+
+class NearIndex(object):
+    """an index of flat records of any record type for near duplicate
+    lookups. The records are hashed on their exact part, as Comparison.split
+    gives it, into buckets, so a lookup only compares the values with a
+    tolerance of the records of its bucket.
+    """
+
+    def __init__(self, tolerances=None, ignore=(), key=None):
+        self.comparison = Comparison(tolerances, ignore, key)
+        self.buckets = {}
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def insert(self, key, flat):
+        """adds a flat record under a key, only the values with a tolerance
+        being kept.
+        """
+        exact, numeric = self.comparison.split(flat)
+        self.buckets.setdefault(exact, []).append((key, numeric))
+
+    def query(self, flat):
+        """the keys of the near duplicates of a flat record.
+        """
+        exact, numeric = self.comparison.split(flat)
+        return [key for key, other in self.buckets.get(exact, []) if self.comparison.close(numeric, other)]
@@ -0,0 +1,103 @@
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from duplicates import fingerprint, fingerprint_codes, stage
+
+COLUMNS = ['key', 'neighbor', 'rank', 'distance']
+
+def group_neighbors(points, k, p):
+    """the positions and distances of the k nearest neighbours of each point
+    among the points of a group, the point itself excluded, nearest first.
+    A group of fewer than k + 1 points gives fewer neighbours.
+    """
+    count = min(k + 1, len(points))
+    if count < 2:
+        return np.zeros((len(points), 0), dtype=np.int64), np.zeros((len(points), 0))
+
+    distances, neighbors = cKDTree(points).query(points, k=count, p=p)
+    distances = distances.reshape(len(points), count)
+    neighbors = neighbors.reshape(len(points), count)
+    # each point is dropped from its own neighbours, an exact duplicate may be
+    # found before it, and the farthest neighbour is dropped if it is not found
+    keep = neighbors != np.arange(len(points))[:, None]
+    keep[keep.all(axis=1), -1] = False
+    return (neighbors[keep].reshape(len(points), count - 1),
+            distances[keep].reshape(len(points), count - 1))
+
+def groups_neighbors(groups, k, p):
+    """group_neighbors of many groups of points.
+    """
+    return [group_neighbors(points, k, p) for points in groups]
+
+def batches(sizes, rows):
+    """splits groups of sizes in consecutive batches of about rows points.
+    """
+    batch, total = [], 0
+    for index, size in enumerate(sizes):
+        batch.append(index)
+        total += size
+        if total >= rows:
+            yield batch
+            batch, total = [], 0
+    if batch:
+        yield batch
+
+def nearest(frame, dcols, fcols, k=5, p=np.inf, key='key', processes=None, rows=20000):
+    """the k nearest neighbours of every record of a DataFrame among the
+    records with identical dcols, missing values being equal, under the
+    distance of the fcols scaled by their tolerances, so that a distance of
+    at most 1 with the default p of inf means a duplicate.
+
+    Each group of identical dcols is searched with its own KD-tree. The groups
+    are processed in batches of about rows records, on a process pool unless a
+    single process is requested. The records with missing fcols values have
+    no neighbours, the fcols with a zero tolerance must match exactly.
+
+    Returns a DataFrame of the key, neighbor key, rank from 1 and distance of
+    each neighbour, ordered by record and rank.
+    """
+    fcols = dict(fcols)
+    exact = [col for col, tolerance in fcols.items() if tolerance == 0]
+    scaled = [col for col, tolerance in fcols.items() if tolerance != 0]
+    tolerances = np.array([fcols[col] for col in scaled], dtype=float)
+
+    points = frame[scaled].values.astype(float).reshape(len(frame), len(scaled)) / tolerances
+    if not scaled:
+        points = np.zeros((len(frame), 1))
+    valid = ~np.isnan(points).any(axis=1)
+    if exact:
+        valid &= ~frame[exact].isnull().any(axis=1).values
+    codes = stage('neighbors.group', lambda x: fingerprint_codes(
+        fingerprint(x, list(dcols) + exact)), frame)
+
+    positions = np.flatnonzero(valid)
+    positions = positions[np.argsort(codes[positions], kind='mergesort')]
+    starts = np.flatnonzero(np.diff(codes[positions], prepend=-1))
+    groups = np.split(positions, starts[1:])
+
+    args = [([points[groups[index]] for index in batch], k, p)
+            for batch in batches([len(group) for group in groups], rows)]
+    if processes == 1:
+        found = stage('neighbors.query', lambda x: [groups_neighbors(*arg) for arg in x], args)
+    else:
+        with Pool(processes) as pool:
+            found = stage('neighbors.query', lambda x: pool.starmap(groups_neighbors, x), args)
+
+    positions, neighbors, ranks, distances = [], [], [], []
+    for group, (found_neighbors, found_distances) in zip(groups, (item for batch in found for item in batch)):
+        width = found_neighbors.shape[1]
+        positions.append(np.repeat(group, width))
+        neighbors.append(group[found_neighbors.ravel()])
+        ranks.append(np.tile(np.arange(1, width + 1), len(group)))
+        distances.append(found_distances.ravel())
+
+    positions, neighbors, ranks, distances = (
+        np.concatenate(arrays) for arrays in (positions, neighbors, ranks, distances))
+    order = np.lexsort((ranks, positions))
+    keys = frame[key].values
+    return pd.DataFrame(dict(
+        key=keys[positions[order]], neighbor=keys[neighbors[order]],
+        rank=ranks[order], distance=distances[order]), columns=COLUMNS)
@@ -1,6 +1,26 @@
-import pyjq
+import itertools
 import json
-import os
+from multiprocessing import Pool
+
+def flatten(source):
+    """flattens a nested json like structure into a single level dictionary
+    with dotted keys. List elements are keyed by their index and empty lists
+    and dictionaries are kept as values.
+    """
+    flattened = {}
+    stack = [((), source)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, dict) and value:
+            children = [(path + (str(key),), child) for key, child in value.items()]
+        elif isinstance(value, (list, tuple)) and value:
+            children = [(path + (str(index),), child) for index, child in enumerate(value)]
+        else:
+            flattened[".".join(path)] = value
+            continue
+        stack.extend(reversed(children))
+
+    return flattened
 
 def reshape(source=None, destination="."):
     """the reshape feature that takes a json file and reshape it in a flat
@@ -9,11 +29,40 @@ def reshape(source=None, destination="."):
     if source is None:
         return {}
 
-    cmd = "echo '%s' | jq 'reduce ( tostream | select(length==2) | .[0] |= [join(\".\")] ) as [$p,$v] (\
-                        {}\
-                        ; setpath($p; $v)\
-                        )'"%(json.dumps(source))
+    return flatten(source)
+
+def reshape_many(sources, destination="."):
+    """reshapes many json records in one call.
+    """
+    return [reshape(source, destination) for source in sources]
+
+def reshape_path(path):
+    """reshapes the json record of a file.
+    """
+    with open(path, "r") as source_f:
+        return reshape(json.loads(source_f.read()))
 
-    flattened = os.popen("{}".format(cmd)).read()
+def reshape_line(line):
+    """reshapes a json record written on a single line.
+    """
+    return reshape(json.loads(line))
+
+def reshape_stream(func, items, processes=None, window=1024):
+    """reshapes many items, file paths with reshape_path or json lines with
+    reshape_line, on a process pool and yields the flattened records in order.
+    The items are consumed by windows so that at most window records are in
+    flight at once.
+    """
+    items = iter(items)
+    if processes == 1:
+        for item in items:
+            yield func(item)
+        return
 
-    return json.loads(flattened)
+    with Pool(processes) as pool:
+        while True:
+            batch = list(itertools.islice(items, window))
+            if not batch:
+                return
+            for flattened in pool.imap(func, batch, chunksize=max(1, len(batch) // 64)):
+                yield flattened
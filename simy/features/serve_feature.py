@@ -0,0 +1,122 @@
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from ..record import CalculationRelaxStatic
+from . import reshape_feature
+
+class SimilarityServer(object):
+    """answers reshape and similarity check requests against a warm
+    SimilarityIndex. The index is shared by the threads of the clients, the
+    checks and the inserts are serialized by a lock.
+    """
+
+    def __init__(self, similarity, record_type=CalculationRelaxStatic):
+        self.similarity = similarity
+        self.record_type = record_type
+        self.fields = similarity.dcols + list(similarity.fcols)
+        self.lock = threading.Lock()
+
+    def flat(self, record):
+        """the flat dictionary of a record given as a flat dictionary, or as a
+        model dictionary, json or xml parsed by the record type.
+        """
+        if isinstance(record, dict) and all(field in record for field in self.fields):
+            return record
+        return self.record_type(None, record, fields=self.fields).dict
+
+    def reshape(self, payload):
+        return dict(record=reshape_feature.reshape(payload.get('record')))
+
+    def check(self, payload):
+        record = self.flat(payload['record'])
+        with self.lock:
+            return dict(keys=self.similarity.check(record))
+
+    def insert(self, payload):
+        """checks a record and adds it to the index under its key, so that the
+        next checks see it.
+        """
+        record = self.flat(payload['record'])
+        with self.lock:
+            keys = self.similarity.check(record)
+            self.similarity.insert(payload['key'], record)
+        return dict(keys=keys)
+
+    def handle(self, op, payload):
+        """answers a request, the op being one of reshape, check or insert.
+        """
+        operations = dict(reshape=self.reshape, check=self.check, insert=self.insert)
+        if op not in operations:
+            raise ValueError("unknown operation {0}".format(op))
+        return operations[op](payload)
+
+    def answer(self, op, payload):
+        """answers a request and reports its failure instead of raising.
+        """
+        try:
+            return self.handle(op, payload), True
+        except Exception as error:  # pylint: disable=broad-except
+            return dict(error='{0}: {1}'.format(type(error).__name__, error)), False
+
+class HTTPHandler(BaseHTTPRequestHandler):
+    """POST /reshape, /check or /insert with a json body.
+    """
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError as error:
+            response, success = dict(error='ValueError: {0}'.format(error)), False
+        else:
+            response, success = self.server.similarity.answer(self.path.strip('/'), payload)
+
+        output = json.dumps(response).encode()
+        self.send_response(200 if success else 400)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+class UnixHandler(socketserver.StreamRequestHandler):
+    """one json request per line, {"op": ..., ...}, answered by one json line.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                payload = json.loads(line)
+            except ValueError as error:
+                response = dict(error='ValueError: {0}'.format(error))
+            else:
+                response, _ = self.server.similarity.answer(payload.get('op'), payload)
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """an HTTP server handling each request in a thread, as the one of
+    http.server which only comes with python 3.7.
+    """
+
+def http_server(similarity, host='127.0.0.1', port=8765):
+    """a threaded localhost HTTP server of a SimilarityServer.
+    """
+    server = ThreadingHTTPServer((host, port), HTTPHandler)
+    server.daemon_threads = True
+    server.similarity = similarity
+    return server
+
+def unix_server(similarity, path):
+    """a threaded Unix socket server of a SimilarityServer.
+    """
+    server = socketserver.ThreadingUnixStreamServer(path, UnixHandler)
+    server.daemon_threads = True
+    server.similarity = similarity
+    return server
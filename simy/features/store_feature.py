@@ -0,0 +1,155 @@
+import json
+import sqlite3
+
+import numpy as np
+
+from .index_feature import exact
+
+def plain(value):
+    """converts numpy scalars to python values that sqlite and json accept.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def quote(name):
+    """quotes a column name, flattened keys hold dots and dashes.
+    """
+    return '"{0}"'.format(name.replace('"', '""'))
+
+class SqliteStore(object):
+    """a store of flattened records in a local SQLite file. The dcols and
+    fcols of the records get their own indexed columns so that similarity
+    checks are an indexed equality on the dcols and a range on the first fcol,
+    and the store does not need to fit in memory. The file is opened in WAL
+    mode so that many processes can check records concurrently.
+    """
+
+    def __init__(self, path, dcols=None, fcols=None, key='key'):
+        """opens the store at path, creating it for the given dcols and fcols
+        if it does not exist yet.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS columns (position INTEGER, name TEXT, tolerance REAL)')
+        columns = self.connection.execute(
+            'SELECT name, tolerance FROM columns ORDER BY position').fetchall()
+
+        if columns:
+            self.key = columns[0][0]
+            self.dcols = [name for name, tolerance in columns[1:] if tolerance is None]
+            self.fcols = dict((name, tolerance) for name, tolerance in columns[1:] if tolerance is not None)
+        else:
+            self.key = key
+            self.dcols = list(dcols or [])
+            self.fcols = dict(fcols or {})
+            self.create()
+
+    def create(self):
+        """creates the records table and its index.
+        """
+        columns = [(self.key, None)] + [(col, None) for col in self.dcols] + list(self.fcols.items())
+        definitions = ['{0} TEXT PRIMARY KEY'.format(quote(self.key))]
+        definitions += [quote(col) for col in self.dcols]
+        definitions += ['{0} REAL'.format(quote(col)) for col in self.fcols]
+        definitions += ['record TEXT', 'duplicate INTEGER']
+        indexed = ', '.join(quote(col) for col in self.dcols + list(self.fcols)[:1])
+
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO columns VALUES (?, ?, ?)',
+                [(position, name, tolerance) for position, (name, tolerance) in enumerate(columns)])
+            self.connection.execute('CREATE TABLE records ({0})'.format(', '.join(definitions)))
+            if indexed:
+                self.connection.execute('CREATE INDEX similarity ON records ({0})'.format(indexed))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def row(self, record):
+        """the values of the records table columns for a record.
+        """
+        values = [plain(record[self.key])]
+        values += [plain(exact(record[col])) for col in self.dcols]
+        values += [plain(exact(record[col])) for col in self.fcols]
+        return values + [json.dumps(record, default=plain), None]
+
+    def ingest(self, records, batch=10000):
+        """adds records to the store, replacing the ones with the same key,
+        with one transaction per batch of records.
+        """
+        statement = 'INSERT OR REPLACE INTO records VALUES ({0})'.format(
+            ', '.join(['?'] * (len(self.dcols) + len(self.fcols) + 3)))
+        rows = []
+        for record in records:
+            rows.append(self.row(record))
+            if len(rows) == batch:
+                with self.connection:
+                    self.connection.executemany(statement, rows)
+                rows = []
+        with self.connection:
+            self.connection.executemany(statement, rows)
+
+    def get(self, key):
+        """returns the record with the given key.
+        """
+        row = self.connection.execute(
+            'SELECT record FROM records WHERE {0} = ?'.format(quote(self.key)), (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def query(self, record, where='', parameters=()):
+        """returns the rowid and key of the stored records similar to a record
+        and matching an extra where clause.
+        """
+        values = [plain(exact(record[col])) for col in self.fcols]
+        if any(value is None for value in values):
+            return []
+
+        clauses = ['{0} IS ?'.format(quote(col)) for col in self.dcols]
+        clauses += ['{0} BETWEEN ? AND ?'.format(quote(col)) for col in self.fcols]
+        bounds = []
+        for value, tolerance in zip(values, self.fcols.values()):
+            bounds += [np.nextafter(value - tolerance, -np.inf), np.nextafter(value + tolerance, np.inf)]
+
+        statement = 'SELECT rowid, {0}, {1} FROM records WHERE {2}'.format(
+            quote(self.key), ', '.join(quote(col) for col in self.fcols) or 'NULL',
+            ' AND '.join(clauses + ([where] if where else [])) or '1')
+        rows = self.connection.execute(
+            statement,
+            [plain(exact(record[col])) for col in self.dcols] + [plain(bound) for bound in bounds] + list(parameters))
+
+        return [(row[0], row[1]) for row in rows
+                if all(abs(stored - value) <= tolerance for stored, value, tolerance
+                       in zip(row[2:], values, self.fcols.values()))]
+
+    def check(self, record):
+        """returns the keys of the stored records similar to a record.
+        """
+        return [key for _, key in self.query(record)]
+
+    def duplicates(self, batch=10000):
+        """flags the duplicates of the store, keeping the first ingested of
+        similar records, and returns the keys of the duplicates. The records
+        are visited in batches so the memory stays bounded.
+        """
+        with self.connection:
+            self.connection.execute('UPDATE records SET duplicate = NULL')
+
+        last, duplicates = 0, []
+        while True:
+            rows = self.connection.execute(
+                'SELECT rowid, record FROM records WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (last, batch)).fetchall()
+            if not rows:
+                return duplicates
+
+            with self.connection:
+                for rowid, record in rows:
+                    record = json.loads(record)
+                    duplicate = bool(self.query(record, 'rowid < ? AND duplicate = 0', (rowid,)))
+                    self.connection.execute(
+                        'UPDATE records SET duplicate = ? WHERE rowid = ?', (int(duplicate), rowid))
+                    if duplicate:
+                        duplicates.append(record[self.key])
+            last = rows[-1][0]
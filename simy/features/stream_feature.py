@@ -0,0 +1,178 @@
+import codecs
+import itertools
+import json
+import re
+import xml.etree.ElementTree as ET
+
+from .reshape_feature import flatten
+
+# The xml constants converted like DataModelDict does
+CONSTANTS = {'': None, 'True': True, 'False': False, 'true': True, 'false': False,
+             '-Infinity': float('-inf'), 'Infinity': float('inf'), 'NaN': float('nan')}
+DECLARATION = re.compile(r'<\?xml[^>]*\?>')
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+CHUNK = 1 << 14
+
+def convert(text):
+    """converts the text of an xml element or attribute to a value, like
+    DataModelDict does.
+    """
+    if text is None:
+        return None
+    text = text.replace('\\n', '\n').replace('\\t', '\t').replace('\\r', '\r')
+    if text in CONSTANTS:
+        return CONSTANTS[text]
+    try:
+        value = int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+    return value if str(value) == text else text
+
+def element_value(element):
+    """the value of an xml element as DataModelDict reads it: attributes are
+    @ keys, repeated children are lists and the text of an element with
+    attributes or children is its #text key.
+    """
+    text = ''.join([element.text or ''] + [child.tail or '' for child in element]).strip()
+    if not len(element) and not element.attrib:
+        return convert(text or None)
+
+    value, lists = {}, set()
+    for name, attribute in element.attrib.items():
+        value['@' + name] = convert(attribute)
+    for child in element:
+        child_value = element_value(child)
+        if child.tag in lists:
+            value[child.tag].append(child_value)
+        elif child.tag in value:
+            value[child.tag] = [value[child.tag], child_value]
+            lists.add(child.tag)
+        else:
+            value[child.tag] = child_value
+    if text:
+        value['#text'] = convert(text)
+    return value
+
+def flatten_element(element):
+    """flattens an xml record element into the same dotted keys as the
+    reshape of its DataModelDict json.
+    """
+    return flatten({element.tag: element_value(element)})
+
+def chunks(source, size=CHUNK):
+    """reads a path or an open file by chunks of text.
+    """
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8') as source_f:
+            yield from chunks(source_f, size)
+        return
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = source.read(size)
+        if not chunk:
+            return
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+def iterxml(source):
+    """yields the flat records of an xml file, or of many xml documents
+    concatenated in a dump, one at a time so that only one record is in
+    memory.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    parser.feed('<dump>')
+    depth, dump, pending = 0, None, ''
+    for chunk in chunks(source):
+        # the documents are wrapped in a single dump element, so their
+        # declarations are dropped, and a tag cut at the end of the chunk is
+        # held back until it is complete
+        chunk = pending + chunk
+        cut = chunk.rfind('<')
+        if cut >= 0 and '>' not in chunk[cut:]:
+            chunk, pending = chunk[:cut], chunk[cut:]
+        else:
+            pending = ''
+        parser.feed(DECLARATION.sub('', chunk))
+        for event, element in parser.read_events():
+            if event == 'start':
+                dump = element if depth == 0 else dump
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                yield flatten_element(element)
+                dump.clear()
+    parser.feed(DECLARATION.sub('', pending) + '</dump>')
+    parser.close()
+
+def iterjson(source):
+    """yields the flat records of a json file, of json records concatenated
+    or one per line in a dump, or of the items of a json list.
+
+    The items of a list are decoded one at a time and the decoded text is
+    dropped, so that only a record and a chunk are in memory. A record cut
+    at the end of the text read so far is only decoded again once the text
+    has doubled, so that a large record is not decoded again for each chunk.
+    """
+    decoder = json.JSONDecoder()
+    # outside a list, at its start, after one of its items or after a comma
+    state = None
+    buffer, pos, wait = '', 0, 0
+    for chunk in itertools.chain(chunks(source), [None]):
+        buffer = buffer[pos:] + (chunk or '')
+        pos = 0
+        if chunk is not None and len(buffer) < wait:
+            continue
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if state is None and char == '[':
+                state, pos = 'start', pos + 1
+                continue
+            if state in ('start', 'item') and char == ']':
+                state, pos = None, pos + 1
+                continue
+            if state == 'item':
+                if char != ',':
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+                state, pos = 'comma', pos + 1
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if chunk is None:
+                    raise
+                wait = 2 * (len(buffer) - pos)
+                break
+            if end == len(buffer) and chunk is not None:
+                # a number may go on in the next chunk
+                wait = 0
+                break
+            pos, state = end, None if state is None else 'item'
+            yield flatten(value)
+    if state is not None:
+        raise json.JSONDecodeError("Expecting ']'", buffer, len(buffer))
+
+def iterrecords(source):
+    """yields the flat records of an xml or json file or dump, told apart by
+    their first character.
+    """
+    first = ''
+    for chunk in chunks(source, 1024):
+        first = chunk.lstrip()[:1]
+        if first:
+            break
+    if not isinstance(source, str):
+        source.seek(0)
+
+    if first == '<':
+        return iterxml(source)
+    if first in ('{', '['):
+        return iterjson(source)
+    if not first:
+        return iter([])
+    raise ValueError('could not identify the content of {0}'.format(source))
@@ -0,0 +1,134 @@
+import asyncio
+import fnmatch
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from .index_feature import SimilarityIndex
+from .load_feature import parse
+
+class Watcher(object):
+    """keeps the duplicate state of a store directory up to date as record
+    files land in it. The records are checked against a SimilarityIndex of
+    the records kept so far, and only inserted if they are not duplicates, so
+    the first record seen is kept, a record is never reported as a duplicate
+    of a duplicate and each new record costs a check of its bucket only. The
+    state, the index and the stat, indexed keys and duplicated keys of each
+    file, is persisted in a state file.
+
+    When kept records are forgotten, as their file is removed or modified, the
+    files with duplicates of them are parsed again, in the same poll for a
+    removed file and in the next one for a modified file, so their records are
+    checked against the records kept then.
+    """
+
+    def __init__(self, directory, dcols, fcols, state=None, pattern='*.xml', key='key'):
+        self.directory = directory
+        self.pattern = pattern
+        self.key = key
+        self.state = state
+        if state and os.path.exists(state):
+            with open(state, 'rb') as state_f:
+                self.similarity, self.files = pickle.load(state_f)
+        else:
+            self.similarity, self.files = SimilarityIndex(dcols, fcols), {}
+
+    def scan(self):
+        """the stat of the record files of the directory.
+        """
+        stats = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and fnmatch.fnmatch(entry.name, self.pattern):
+                stat = entry.stat()
+                stats[entry.path] = (stat.st_mtime, stat.st_size)
+        return stats
+
+    def changed(self, stats):
+        """the paths of the new or modified files, and of the files to parse
+        again, of a scan.
+        """
+        return sorted(path for path, stat in stats.items()
+                      if self.files.get(path, (None, None))[:2] != stat)
+
+    def forget(self, path):
+        """removes the records of a file from the index, and clears the stat of
+        the files with duplicates of them so that they are parsed again.
+        """
+        entries = self.files.pop(path, (None, None, [], set()))[2]
+        for key, bucket in entries:
+            self.similarity.remove(key, bucket)
+        keys = set(key for key, _ in entries)
+        for other, (_, _, kept, of) in list(self.files.items()):
+            if of & keys:
+                self.files[other] = (None, None, kept, of)
+
+    def update(self, path, stat, records):
+        """replaces the records of a file in the index and returns the event
+        of each record, whether it is a duplicate and of which kept keys.
+        """
+        self.forget(path)
+        events, entries, of = [], [], set()
+        for record in records:
+            key = record[self.key]
+            keys = self.similarity.check(record)
+            if not keys:
+                self.similarity.insert(key, record)
+                entries.append((key, self.similarity.bucket(record)))
+            of.update(keys)
+            events.append(dict(event='record', path=path, key=key, duplicate=bool(keys), of=keys))
+        self.files[path] = stat + (entries, of)
+        return events
+
+    def save(self):
+        """persists the state, replacing the state file at once.
+        """
+        if not self.state:
+            return
+        with open(self.state + '.tmp', 'wb') as state_f:
+            pickle.dump((self.similarity, self.files), state_f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.state + '.tmp', self.state)
+
+    async def poll(self, executor, emit):
+        """scans the directory once, parses the new or modified files on the
+        executor and emits their events in the order of their paths. A file
+        that fails to parse is reported and parsed again once it changes.
+        """
+        loop = asyncio.get_event_loop()
+        stats = await loop.run_in_executor(None, self.scan)
+        removed = sorted(set(self.files) - set(stats))
+        for path in removed:
+            self.forget(path)
+            emit(dict(event='removed', path=path))
+
+        changed = self.changed(stats)
+        futures = [loop.run_in_executor(executor, parse, path) for path in changed]
+        for path, future in zip(changed, futures):
+            try:
+                records = await future
+            except Exception as error:  # pylint: disable=broad-except
+                self.forget(path)
+                self.files[path] = stats[path] + ([], set())
+                emit(dict(event='error', path=path, error='{0}: {1}'.format(type(error).__name__, error)))
+                continue
+            for event in self.update(path, stats[path], records):
+                emit(event)
+
+        if changed or removed:
+            self.save()
+        return len(changed) + len(removed)
+
+    async def watch(self, emit, interval=1.0, processes=None, once=False):
+        """polls the directory every interval seconds, or only once, and emits
+        the events of its changes. The files are parsed on a process pool
+        unless a single process is requested.
+        """
+        executor = None if processes == 1 else ProcessPoolExecutor(processes)
+        try:
+            while True:
+                await self.poll(executor, emit)
+                if once:
+                    return
+                await asyncio.sleep(interval)
+        finally:
+            if executor is not None:
+                executor.shutdown()
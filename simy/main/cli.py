@@ -1,7 +1,35 @@
 import click
+import functools
+import glob
 import json
+import os
+import sys
 from ..features import reshape_feature
 
+# The features below pull in numpy, pandas, atomman and iprPy, so they are
+# only imported by the commands that need them to keep the startup fast.
+
+def profiling(command):
+    """adds a --profile flag to a command that writes the wall time, rows
+    in and out and peak memory of each pipeline stage run by the command as a
+    json report on stderr.
+    """
+    @click.option('--profile/--no-profile', default=False, help="Request the json report of the pipeline stages on stderr.")
+    @functools.wraps(command)
+    def profiled_command(profile, **kwargs):
+        if not profile:
+            return command(**kwargs)
+
+        from duplicates import profiled, summarize
+
+        with profiled() as stages:
+            result = command(**kwargs)
+        report = dict(stages=stages, totals=summarize(stages))
+        sys.stderr.write(json.dumps(report, sort_keys=True, indent=4, separators=(',', ': ')) + "\n")
+        return result
+
+    return profiled_command
+
 # Simy cli stuff for multiple commands interface.
 @click.group()
 def cli():
@@ -13,15 +41,20 @@ def cli():
     pass
 
 @cli.command()
-@click.option('--src', default=None, help="The json file to be reshaped.")
+@click.option('--src', default=None, help="The json file to be reshaped, or a directory, a glob or - for json lines on stdin to reshape in batch.")
 @click.option('--dst', default=None, help="Provide a custom destination for the reshaped json.")
 @click.option('--gen/--no-gen', default=None, help="Request the creation of the reshaped json.")
 @click.option('--prt/--no-prt', default=None, help="Request the creation of the reshaped json.")
-def reshape(src, dst, gen, prt):
-    """flattens any nested dictionary using jq.
+@click.option('--out', default=None, help="The json lines file of the records reshaped in batch, stdout by default.")
+@click.option('--processes', default=None, type=int, help="The number of reshaping processes in batch.")
+def reshape(src, dst, gen, prt, out, processes):
+    """flattens any nested dictionary. A directory, a glob or json lines on
+    stdin are reshaped in batch and written as json lines.
     """
+    if src and (src == '-' or os.path.isdir(src) or glob.has_magic(src)):
+        return reshape_batch(src, out, processes)
+
     source = None
-    dump = False
     destination = "."
 
     if src:
@@ -34,15 +67,360 @@ def reshape(src, dst, gen, prt):
     flattened = reshape_feature.reshape(source, destination)
 
     if gen:
-        name = src.split("/")[-1]
-        blocks = name.split(".")
-        reshaped = "{0}/{1}-reshaped.{2}".format(destination, blocks[0], blocks[1])
+        name, extension = os.path.splitext(os.path.basename(src))
+        reshaped = "{0}/{1}-reshaped{2}".format(destination, name, extension)
         with open(reshaped, "w") as reshaped_f:
             reshaped_f.write(json.dumps(flattened, sort_keys=True, indent=4, separators=(',', ': ')))
 
     if prt:
         print(json.dumps(flattened, sort_keys=True, indent=4, separators=(',', ': ')))
 
+def reshape_batch(src, out, processes):
+    """streams the reshaped records of a directory, a glob or json lines on
+    stdin as json lines.
+    """
+    if src == '-':
+        func, items = reshape_feature.reshape_line, (line for line in sys.stdin if line.strip())
+    elif os.path.isdir(src):
+        func, items = reshape_feature.reshape_path, sorted(glob.glob(os.path.join(src, '*.json')))
+    else:
+        func, items = reshape_feature.reshape_path, sorted(glob.glob(src))
+
+    out_f = open(out, "w") if out else sys.stdout
+    try:
+        for flattened in reshape_feature.reshape_stream(func, items, processes):
+            out_f.write(json.dumps(flattened) + "\n")
+    finally:
+        if out:
+            out_f.close()
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be loaded.")
+@click.option('--dst', default=None, help="Provide a csv file to write the loaded records to.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records.")
+@click.option('--processes', default=None, type=int, help="The number of parsing processes.")
+@click.option('--prt/--no-prt', default=None, help="Request the printing of the loaded records.")
+@click.option('--fingerprint', default=None, type=click.Choice(['64', '128']), help="Add the 64 or 128 bit fingerprint columns of the exact comparison terms.")
+@profiling
+def load(src, dst, cache, processes, prt, fingerprint):
+    """loads a store directory of records in a table.
+    """
+    from ..features import load_feature
+
+    frame = load_feature.load(src, cache, processes)
+
+    if fingerprint:
+        from duplicates import add_fingerprint
+        from ..record import CalculationRelaxStatic
+
+        record = CalculationRelaxStatic(None, None)
+        frame = add_fingerprint(frame, list(record.compare_terms), int(fingerprint))
+
+    if dst:
+        frame.to_csv(dst, index=False)
+
+    if prt:
+        print(frame.to_string())
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be indexed.")
+@click.option('--dst', default=None, help="The index file to be created.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records.")
+@profiling
+def index(src, dst, cache):
+    """builds the similarity index of a store directory of records.
+    """
+    from ..features import index_feature, load_feature
+    from ..record import CalculationRelaxStatic
+
+    record = CalculationRelaxStatic(None, None)
+    frame = load_feature.load(src, cache)
+    similarity = index_feature.SimilarityIndex.build(frame, record.compare_terms, record.compare_fterms)
+    similarity.save(dst)
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be mapped, the matrix is reused if not given.")
+@click.option('--dst', default=None, help="The directory of the feature matrix.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records.")
+@click.option('--dups/--no-dups', default=None, help="Request the printing of the keys of the duplicates.")
+@click.option('--method', default='numpy', help="The duplicates_allclose method.")
+@click.option('--processes', default=None, type=int, help="The number of dedupe processes.")
+@profiling
+def matrix(src, dst, cache, dups, method, processes):
+    """maps the comparison terms of a store directory of records in a feature
+    matrix and dedupes it.
+    """
+    from ..features import load_feature, matrix_feature
+    from ..record import CalculationRelaxStatic
+
+    if src:
+        record = CalculationRelaxStatic(None, None)
+        frame = load_feature.load(src, cache)
+        features = matrix_feature.FeatureMatrix.write(dst, frame, record.compare_terms, record.compare_fterms)
+    else:
+        features = matrix_feature.FeatureMatrix(dst)
+
+    if dups:
+        if processes == 1:
+            mask = features.duplicates(method=method)
+        else:
+            mask = features.duplicates_parallel(method=method, processes=processes)
+        for key in mask.index[mask.values]:
+            print(key)
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be compared.")
+@click.option('--matrix', default=None, help="The feature matrix of the store instead of a store directory.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records.")
+@click.option('--k', default=5, help="The number of nearest neighbours of each record.")
+@click.option('--p', default=float('inf'), help="The Minkowski p-norm of the tolerance-scaled distance, inf for the largest difference.")
+@click.option('--dst', default=None, help="Provide a csv file to write the neighbours to.")
+@click.option('--processes', default=None, type=int, help="The number of search processes.")
+@profiling
+def neighbors(src, matrix, cache, k, p, dst, processes):
+    """reports the k nearest neighbours of each record of a store among the
+    records with the same exact comparison terms, the distance being scaled
+    by the tolerances so that duplicates are at most 1 apart.
+    """
+    from ..features import neighbors_feature
+
+    if matrix:
+        from ..features import matrix_feature
+
+        features = matrix_feature.FeatureMatrix(matrix)
+        frame, dcols, fcols = features.frame().assign(key=features.keys), features.pcols, features.fcols
+    else:
+        from ..features import load_feature
+        from ..record import CalculationRelaxStatic
+
+        record = CalculationRelaxStatic(None, None)
+        frame, dcols, fcols = load_feature.load(src, cache), record.compare_terms, record.compare_fterms
+
+    report = neighbors_feature.nearest(frame, dcols, fcols, k=k, p=p, processes=processes)
+    if dst:
+        report.to_csv(dst, index=False)
+    else:
+        print(report.to_string(index=False))
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory to watch for new or modified records.")
+@click.option('--state', default=None, help="The file persisting the duplicate state between runs.")
+@click.option('--out', default=None, help="The json lines file the events are appended to, stdout by default.")
+@click.option('--interval', default=1.0, help="The number of seconds between two scans of the store.")
+@click.option('--processes', default=None, type=int, help="The number of parsing processes.")
+@click.option('--once/--no-once', default=False, help="Request a single scan of the store.")
+def watch(src, state, out, interval, processes, once):
+    """watches a store directory and emits a json line per new record telling
+    whether it is a duplicate and of which kept records.
+    """
+    import asyncio
+    from ..features import watch_feature
+    from ..record import CalculationRelaxStatic
+
+    record = CalculationRelaxStatic(None, None)
+    watcher = watch_feature.Watcher(src, record.compare_terms, record.compare_fterms, state)
+
+    out_f = open(out, "a") if out else sys.stdout
+
+    def emit(event):
+        out_f.write(json.dumps(event) + "\n")
+        out_f.flush()
+
+    try:
+        asyncio.get_event_loop().run_until_complete(watcher.watch(emit, interval, processes, once))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out:
+            out_f.close()
+
+@cli.command()
+@click.option('--src', default=None, help="The xml or json records of any type to compare, a file, a directory or a glob.")
+@click.option('--tolerance', multiple=True, help="A key glob pattern and the tolerance of its numeric values, as pattern=tolerance.")
+@click.option('--ignore', multiple=True, help="A key glob pattern left out of the comparison.")
+@click.option('--key', default='key', help="The name of the record key under the root element, left out of the comparison.")
+@click.option('--out', default=None, help="The json lines file of the near duplicate pairs, stdout by default.")
+@profiling
+def near(src, tolerance, ignore, key, out):
+    """finds the near duplicate records of any record type without a record
+    class, from their reshaped keys and values: the records with the same keys
+    and values but for the numeric values within tolerance.
+    """
+    from ..features import near_feature, stream_feature
+
+    paths = sorted(glob.glob(os.path.join(src, '*')) if os.path.isdir(src) else glob.glob(src))
+    names, records = [], []
+    for path in paths:
+        found = list(stream_feature.iterrecords(path))
+        names.extend(path if len(found) == 1 else "{0}#{1}".format(path, i) for i in range(len(found)))
+        records.extend(found)
+
+    tolerances = dict((item.rsplit('=', 1)[0], float(item.rsplit('=', 1)[1])) for item in tolerance)
+    first, second = near_feature.near_duplicates(records, tolerances, ignore, key)
+
+    out_f = open(out, "w") if out else sys.stdout
+    try:
+        for i, j in zip(first, second):
+            out_f.write(json.dumps(dict(first=names[i], second=names[j])) + "\n")
+    finally:
+        if out:
+            out_f.close()
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be exported.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records.")
+@click.option('--dst', default=None, help="The directory to write one record file per record to.")
+@click.option('--out', default=None, help="The single file to write all the records to instead.")
+@click.option('--format', 'fmt', default='xml', type=click.Choice(['xml', 'json']), help="The format of the records.")
+@click.option('--unique/--no-unique', default=False, help="Request the export of the records that are not duplicates only.")
+@click.option('--unchanged/--no-unchanged', default=False, help="Request to skip the records unchanged since the last export to dst.")
+@click.option('--processes', default=None, type=int, help="The number of rendering processes.")
+@profiling
+def export(src, cache, dst, out, fmt, unique, unchanged, processes):
+    """exports the records of a store directory, once deduplicated if
+    requested, as record files or as a single json lines or xml dump file.
+    """
+    from ..features import export_feature, load_feature
+    from ..record import CalculationRelaxStatic
+
+    frame = load_feature.load(src, cache)
+    if unique:
+        from duplicates import duplicates_allclose
+
+        record = CalculationRelaxStatic(None, None)
+        dups = duplicates_allclose(frame, list(record.compare_terms), record.compare_fterms, method="numpy")
+        frame = frame[~dups.values]
+
+    export_feature.export(frame, directory=dst, out=out, fmt=fmt, processes=processes, unchanged=unchanged)
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the already deduplicated records.")
+@click.option('--new', default=None, help="The directory of the new batch of records.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records of the store.")
+@click.option('--out', default=None, help="The json lines file of the new records, stdout by default.")
+@profiling
+def delta(src, new, cache, out):
+    """checks a new batch of records against an already deduplicated store
+    and against itself and emits a json line per new record telling whether
+    it is a duplicate and of which keys.
+    """
+    from duplicates_grid import duplicates_delta
+    from ..features import load_feature
+    from ..record import CalculationRelaxStatic
+
+    record = CalculationRelaxStatic(None, None)
+    existing, batch = load_feature.load(src, cache), load_feature.load(new)
+    result = duplicates_delta(existing, batch, list(record.compare_terms), record.compare_fterms)
+
+    out_f = open(out, "w") if out else sys.stdout
+    try:
+        for key, duplicate, keys in zip(batch.key, result.duplicate, result.of):
+            out_f.write(json.dumps(dict(key=key, duplicate=bool(duplicate), of=keys)) + "\n")
+    finally:
+        if out:
+            out_f.close()
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be ingested.")
+@click.option('--db', default=None, help="The SQLite store file, created if needed.")
+@click.option('--batch', default=10000, help="The number of records parsed and inserted at a time.")
+@profiling
+def ingest(src, db, batch):
+    """ingests a store directory of records in a SQLite store. The files are
+    streamed batch by batch rather than loaded in one DataFrame.
+    """
+    from ..features import load_feature, store_feature
+    from ..record import CalculationRelaxStatic
+
+    record = CalculationRelaxStatic(None, None)
+    store = store_feature.SqliteStore(db, record.compare_terms, record.compare_fterms)
+    store.ingest(load_feature.iterdicts(src, batch=batch), batch=batch)
+
+@cli.command()
+@click.option('--src', default=None, help="The xml or json record to be checked.")
+@click.option('--index', default=None, help="The similarity index of the store.")
+@click.option('--db', default=None, help="The SQLite store to check against instead of an index.")
+def check(src, index, db):
+    """checks if a record is similar to records of a store and prints the
+    keys of these similar records.
+    """
+    from ..features import index_feature, store_feature
+    from ..record import CalculationRelaxStatic
+
+    if db:
+        similarity = store_feature.SqliteStore(db)
+    else:
+        similarity = index_feature.SimilarityIndex.load(index)
+    fields = similarity.dcols + list(similarity.fcols)
+    record = CalculationRelaxStatic(src, src, fields=fields)
+    print(json.dumps(similarity.check(record.dict)))
+
+@cli.command()
+@click.option('--src', default=None, help="The store directory of the records to be served.")
+@click.option('--index', default=None, help="The similarity index of the store instead of a store directory.")
+@click.option('--cache', default=None, help="The cache file of the already parsed records.")
+@click.option('--socket', default=None, help="The Unix socket to listen on instead of localhost HTTP.")
+@click.option('--host', default='127.0.0.1', help="The HTTP host to listen on.")
+@click.option('--port', default=8765, help="The HTTP port to listen on.")
+def serve(src, index, cache, socket, host, port):
+    """serves reshape and similarity check requests against a store kept
+    in memory, over a Unix socket or localhost HTTP.
+    """
+    from ..features import index_feature, load_feature, serve_feature
+    from ..record import CalculationRelaxStatic
+
+    if index:
+        similarity = index_feature.SimilarityIndex.load(index)
+    else:
+        record = CalculationRelaxStatic(None, None)
+        frame = load_feature.load(src, cache)
+        similarity = index_feature.SimilarityIndex.build(frame, record.compare_terms, record.compare_fterms)
+
+    similarity = serve_feature.SimilarityServer(similarity)
+    if socket:
+        server = serve_feature.unix_server(similarity, socket)
+    else:
+        server = serve_feature.http_server(similarity, host, port)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket and os.path.exists(socket):
+            os.remove(socket)
+
+@cli.command()
+@click.option('--rows', multiple=True, type=int, default=[1000, 10000], help="The sizes of the generated stores to dedupe.")
+@click.option('--records', default=1000, help="The number of generated records to reshape, parse and flatten.")
+@click.option('--method', multiple=True, default=['sort', 'numpy', 'grid'], help="The duplicates_allclose methods to benchmark.")
+@click.option('--dst', default=None, help="Provide a json file to write the benchmark report to.")
+@click.option('--baseline', default=None, help="A previous json report to compare against.")
+@click.option('--threshold', default=0.2, help="The slowdown fraction reported as a regression.")
+@profiling
+def bench(rows, records, method, dst, baseline, threshold):
+    """benchmarks the similarity pipeline on generated records and reports
+    the regressions against a baseline report.
+    """
+    from .. import benchmarks
+
+    report = benchmarks.run(sizes=rows, records=records, methods=method)
+    output = json.dumps(report, sort_keys=True, indent=4, separators=(',', ': '))
+    if dst:
+        with open(dst, "w") as report_f:
+            report_f.write(output)
+    else:
+        print(output)
+
+    if baseline:
+        with open(baseline, "r") as baseline_f:
+            regressions = benchmarks.compare(report, json.loads(baseline_f.read()), threshold)
+        for regression in regressions:
+            print("regression: {name} on {rows} rows took {seconds:.3g}s instead of {baseline_seconds:.3g}s".format(**regression))
+        if regressions:
+            raise SystemExit(1)
+
 handle = click.CommandCollection(sources=[cli])
 
 if __name__ == '__simy.main__':
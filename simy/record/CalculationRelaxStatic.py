@@ -11,258 +11,231 @@ from DataModelDict import DataModelDict as DM
 
 # https://github.com/usnistgov/atomman
 import atomman.unitconvert as uc
-from iprPy.tools import aslist
+
+from .schema import Schema, field
+
+# Terms of the flat dictionary, in order, for all records. The quantity
+# terms are value/unit terms converted to working units, the layout is the
+# order of the terms in the record models
+FIELDS = Schema([
+    field('key', 'key'),
+    field('script', 'calculation.script'),
+    field('atomman_version', 'calculation.atomman-version'),
+    field('iprPy_version', 'calculation.iprPy-version'),
+    field('LAMMPS_version', 'calculation.LAMMPS-version'),
+
+    field('a_mult1', 'calculation.run-parameter.size-multipliers.a.0'),
+    field('a_mult2', 'calculation.run-parameter.size-multipliers.a.1'),
+    field('b_mult1', 'calculation.run-parameter.size-multipliers.b.0'),
+    field('b_mult2', 'calculation.run-parameter.size-multipliers.b.1'),
+    field('c_mult1', 'calculation.run-parameter.size-multipliers.c.0'),
+    field('c_mult2', 'calculation.run-parameter.size-multipliers.c.1'),
+    field('min_etol', 'calculation.run-parameter.energytolerance'),
+    field('min_ftol', 'calculation.run-parameter.forcetolerance', '{energy}/{length}'),
+    field('min_maxiter', 'calculation.run-parameter.maxiterations'),
+    field('min_maxeval', 'calculation.run-parameter.maxevaluations'),
+    field('min_dmax', 'calculation.run-parameter.maxatommotion', '{length}'),
+
+    field('potential_LAMMPS_key', 'potential-LAMMPS.key'),
+    field('potential_LAMMPS_id', 'potential-LAMMPS.id'),
+    field('potential_key', 'potential-LAMMPS.potential.key'),
+    field('potential_id', 'potential-LAMMPS.potential.id'),
+
+    field('load_file', 'system-info.artifact.file'),
+    field('load_style', 'system-info.artifact.format'),
+    field('load_options', 'system-info.artifact.load_options'),
+    field('family', 'system-info.family'),
+    field('symbols', 'system-info.symbol', joined=True),
+
+    field('temperature', 'phase-state.temperature', 'K'),
+    field('pressure_xx', 'phase-state.pressure-xx', '{pressure}'),
+    field('pressure_yy', 'phase-state.pressure-yy', '{pressure}'),
+    field('pressure_zz', 'phase-state.pressure-zz', '{pressure}'),
+    field('pressure_xy', 'phase-state.pressure-xy', '{pressure}'),
+    field('pressure_xz', 'phase-state.pressure-xz', '{pressure}'),
+    field('pressure_yz', 'phase-state.pressure-yz', '{pressure}'),
+
+    field('status', 'status', default='finished'),
+    field('error', 'error', default=np.nan),
+], layout=['key', 'calculation.iprPy-version', 'calculation.atomman-version',
+           'calculation.LAMMPS-version', 'calculation', 'potential-LAMMPS',
+           'system-info.family', 'system-info'])
+
+# Terms of the flat dictionary, in order, only set for finished records and
+# set to nan otherwise
+FINISHED_FIELDS = Schema([
+    field('initial_load_file', 'initial-system.artifact.file'),
+    field('initial_load_style', 'initial-system.artifact.format'),
+    field('initial_load_options', 'initial-system.artifact.load_options', default=None),
+    field('initial_symbols', 'initial-system.symbols', joined=True),
+
+    field('final_load_file', 'final-system.artifact.file'),
+    field('final_load_style', 'final-system.artifact.format'),
+    field('final_load_options', 'final-system.artifact.load_options', default=None),
+    field('final_symbols', 'final-system.symbols', joined=True),
+
+    field('lx', 'measured-box-parameter.lx', '{length}'),
+    field('ly', 'measured-box-parameter.ly', '{length}'),
+    field('lz', 'measured-box-parameter.lz', '{length}'),
+    field('xy', 'measured-box-parameter.xy', '{length}'),
+    field('xz', 'measured-box-parameter.xz', '{length}'),
+    field('yz', 'measured-box-parameter.yz', '{length}'),
+
+    field('E_cohesive', 'cohesive-energy', '{energy}'),
+    field('measured_temperature', 'measured-phase-state.temperature', 'K'),
+    field('measured_pressure_xx', 'measured-phase-state.pressure-xx', '{pressure}'),
+    field('measured_pressure_yy', 'measured-phase-state.pressure-yy', '{pressure}'),
+    field('measured_pressure_zz', 'measured-phase-state.pressure-zz', '{pressure}'),
+    field('measured_pressure_xy', 'measured-phase-state.pressure-xy', '{pressure}'),
+    field('measured_pressure_xz', 'measured-phase-state.pressure-xz', '{pressure}'),
+    field('measured_pressure_yz', 'measured-phase-state.pressure-yz', '{pressure}'),
+], layout=['initial-system', 'final-system', 'measured-box-parameter',
+           'measured-phase-state'])
 
 class CalculationRelaxStatic(object):
 
-    def __init__(self, name, content):
-        content = DM(content)
-        if self.contentroot in content:
-            self.__content = content
-        else:
-            self.__content = self.dicttomodel(content)
-        
+    __slots__ = ('__name', '__source', '__content', '__fields',
+                 '__dict', '__json', '__xml')
+
+    def __init__(self, name, content, fields=None):
+        """
+        The content is only parsed on first use. If fields are given, dict
+        only holds these terms of the flat dictionary and the other terms
+        are never evaluated.
+        """
         self.__name = name
+        self.__source = content
+        self.__content = None
+        self.__fields = None if fields is None else list(fields)
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Drops the memoized dict, json and xml, for instance after the model
+        has been modified in place.
+        """
+        self.__dict = None
+        self.__json = None
+        self.__xml = None
+
+    @property
+    def name(self):
+        return self.__name
 
     @property
     def dict(self):
-        return self.modeltodict(self.__content)
+        if self.__dict is None:
+            self.__dict = self.modeltodict(self.model, self.__fields)
+        return self.__dict
 
     @property
     def json(self):
-        return self.__content.json()
+        if self.__json is None:
+            self.__json = self.model.json()
+        return self.__json
 
     @property
     def xml(self):
-        return self.__content.xml()
+        if self.__xml is None:
+            self.__xml = self.model.xml()
+        return self.__xml
 
     @property
     def model(self):
+        if self.__content is None:
+            content = DM(self.__source)
+            if self.contentroot in content:
+                self.__content = content
+            else:
+                self.__content = self.dicttomodel(content)
+            self.__source = None
         return self.__content
 
+    @model.setter
+    def model(self, model):
+        self.__content = model
+        self.invalidate()
+
     @property
     def contentroot(self):
         """Schema root element"""
         return 'calculation-relax-static'
-    
-    def modeltodict(self, model):
+
+    @property
+    def compare_terms(self):
+        """Terms of the flat dictionary compared for exact duplicates"""
+        return ['script', 'load_file', 'load_options', 'symbols',
+                'potential_LAMMPS_key', 'a_mult1', 'a_mult2', 'b_mult1',
+                'b_mult2', 'c_mult1', 'c_mult2']
+
+    @property
+    def compare_fterms(self):
+        """Terms of the flat dictionary compared with tolerances"""
+        return {
+            'temperature': 1e-2,
+            'pressure_xx': uc.set_in_units(1e-2, 'GPa'),
+            'pressure_yy': uc.set_in_units(1e-2, 'GPa'),
+            'pressure_zz': uc.set_in_units(1e-2, 'GPa'),
+            'pressure_xy': uc.set_in_units(1e-2, 'GPa'),
+            'pressure_xz': uc.set_in_units(1e-2, 'GPa'),
+            'pressure_yz': uc.set_in_units(1e-2, 'GPa'),
+        }
+
+    def modeltodict(self, model, fields=None):
         """
-        Transforms a tiered data model into a flat dictionary.
+        Transforms a tiered data model into a flat dictionary, limited to the
+        given fields if any.
         """
-        calc = model[self.contentroot]
-        params = {}
-        params['key'] = calc['key']
-        params['script'] = calc['calculation']['script']
-        params['atomman_version'] = calc['calculation']['atomman-version']
-        params['iprPy_version'] = calc['calculation']['iprPy-version']
-        params['LAMMPS_version'] = calc['calculation']['LAMMPS-version']
-
-        params['a_mult1'] = calc['calculation']['run-parameter']['size-multipliers']['a'][0]
-        params['a_mult2'] = calc['calculation']['run-parameter']['size-multipliers']['a'][1]
-        params['b_mult1'] = calc['calculation']['run-parameter']['size-multipliers']['b'][0]
-        params['b_mult2'] = calc['calculation']['run-parameter']['size-multipliers']['b'][1]
-        params['c_mult1'] = calc['calculation']['run-parameter']['size-multipliers']['c'][0]
-        params['c_mult2'] = calc['calculation']['run-parameter']['size-multipliers']['c'][1]
-        params['min_etol'] = calc['calculation']['run-parameter']['energytolerance']
-        params['min_ftol'] = uc.value_unit(calc['calculation']['run-parameter']['forcetolerance'])
-        params['min_maxiter'] = calc['calculation']['run-parameter']['maxiterations']
-        params['min_maxeval'] = calc['calculation']['run-parameter']['maxevaluations']
-        params['min_dmax'] = uc.value_unit(calc['calculation']['run-parameter']['maxatommotion'])
-        
-        params['potential_LAMMPS_key'] = calc['potential-LAMMPS']['key']
-        params['potential_LAMMPS_id'] = calc['potential-LAMMPS']['id']
-        params['potential_key'] = calc['potential-LAMMPS']['potential']['key']
-        params['potential_id'] = calc['potential-LAMMPS']['potential']['id']
-
-        params['load_file'] = calc['system-info']['artifact']['file']
-        params['load_style'] = calc['system-info']['artifact']['format']
-        params['load_options'] = calc['system-info']['artifact']['load_options']
-        params['family'] = calc['system-info']['family']
-        params['symbols'] = ' '.join(aslist(calc['system-info']['symbol']))
-
-        params['temperature'] = uc.value_unit(calc['phase-state']['temperature'])
-        params['pressure_xx'] = uc.value_unit(calc['phase-state']['pressure-xx'])
-        params['pressure_yy'] = uc.value_unit(calc['phase-state']['pressure-yy'])
-        params['pressure_zz'] = uc.value_unit(calc['phase-state']['pressure-zz'])
-        params['pressure_xy'] = uc.value_unit(calc['phase-state']['pressure-xy'])
-        params['pressure_xz'] = uc.value_unit(calc['phase-state']['pressure-xz'])
-        params['pressure_yz'] = uc.value_unit(calc['phase-state']['pressure-yz'])
-
-        params['status'] = calc.get('status', 'finished')
-        params['error'] = calc.get('error', np.nan)
+        return self.modelstodicts([model], fields)[0]
+
+    def modelstodicts(self, models, fields=None):
+        """
+        Transforms many tiered data models into flat dictionaries, looking up
+        each term of all the models at once with the compiled schemas.
+        """
+        calcs = [model[self.contentroot] for model in models]
+        return self.__todicts(
+            lambda schema, rows: schema.extract([calcs[i] for i in rows]),
+            [calc.get('status', 'finished') for calc in calcs], fields)
+
+    def flatstodicts(self, records, fields=None):
+        """
+        Transforms many flat records with the dotted keys of reshape, as
+        streamed by stream_feature, into flat dictionaries without building
+        their data models.
+        """
+        prefix = self.contentroot + '.'
+        return self.__todicts(
+            lambda schema, rows: schema.extract_flat([records[i] for i in rows], prefix),
+            [record.get(prefix + 'status', 'finished') for record in records], fields)
+
+    def __todicts(self, extract, statuses, fields):
+        """
+        The flat dictionaries of records from the columns extracted by a
+        schema for some rows, the finished terms only for the finished rows.
+        """
+        rows = list(range(len(statuses)))
+        finished = [i for i in rows if statuses[i] == 'finished']
+
+        names = FIELDS.names + FINISHED_FIELDS.names if fields is None else list(fields)
+        columns = extract(FIELDS.project(names), rows)
+        for name, values in extract(FINISHED_FIELDS.project(names), finished).items():
+            column = columns[name] = [np.nan] * len(rows)
+            for i, value in zip(finished, values):
+                column[i] = value
+
+        return [{name: columns[name][i] for name in names} for i in rows]
 
-        if params['status'] == 'finished':
-            
-            params['initial_load_file'] = calc['initial-system']['artifact']['file']
-            params['initial_load_style'] = calc['initial-system']['artifact']['format']
-            params['initial_load_options'] = calc['initial-system']['artifact'].get('load_options', None)
-            params['initial_symbols'] = ' '.join(aslist(calc['initial-system']['symbols']))
-            
-            params['final_load_file'] = calc['final-system']['artifact']['file']
-            params['final_load_style'] = calc['final-system']['artifact']['format']
-            params['final_load_options'] = calc['final-system']['artifact'].get('load_options', None)
-            params['final_symbols'] = ' '.join(aslist(calc['final-system']['symbols']))
-            
-            params['lx'] = uc.value_unit(calc['measured-box-parameter']['lx'])
-            params['ly'] = uc.value_unit(calc['measured-box-parameter']['ly'])
-            params['lz'] = uc.value_unit(calc['measured-box-parameter']['lz'])
-            params['xy'] = uc.value_unit(calc['measured-box-parameter']['xy'])
-            params['xz'] = uc.value_unit(calc['measured-box-parameter']['xz'])
-            params['yz'] = uc.value_unit(calc['measured-box-parameter']['yz'])
-
-            params['E_cohesive'] = uc.value_unit(calc['cohesive-energy'])
-            params['measured_temperature'] = uc.value_unit(calc['measured-phase-state']['temperature'])
-            params['measured_pressure_xx'] = uc.value_unit(calc['measured-phase-state']['pressure-xx'])
-            params['measured_pressure_yy'] = uc.value_unit(calc['measured-phase-state']['pressure-yy'])
-            params['measured_pressure_zz'] = uc.value_unit(calc['measured-phase-state']['pressure-zz'])
-            params['measured_pressure_xy'] = uc.value_unit(calc['measured-phase-state']['pressure-xy'])
-            params['measured_pressure_xz'] = uc.value_unit(calc['measured-phase-state']['pressure-xz'])
-            params['measured_pressure_yz'] = uc.value_unit(calc['measured-phase-state']['pressure-yz'])
-        
-        else:
-            params['initial_load_file'] = np.nan
-            params['initial_load_style'] = np.nan
-            params['initial_load_options'] = np.nan
-            params['initial_symbols'] = np.nan
-            
-            params['final_load_file'] = np.nan
-            params['final_load_style'] = np.nan
-            params['final_load_options'] = np.nan
-            params['initial_symbols'] = np.nan
-            
-            params['lx'] = np.nan
-            params['ly'] = np.nan
-            params['lz'] = np.nan
-            params['xy'] = np.nan
-            params['xz'] = np.nan
-            params['yz'] = np.nan
-
-            params['E_cohesive'] = np.nan
-            params['measured_temperature'] = np.nan
-            params['measured_pressure_xx'] = np.nan
-            params['measured_pressure_yy'] = np.nan
-            params['measured_pressure_zz'] = np.nan
-            params['measured_pressure_xy'] = np.nan
-            params['measured_pressure_xz'] = np.nan
-            params['measured_pressure_yz'] = np.nan
-
-        return params
-    
     def dicttomodel(self, params, energy_unit='eV', length_unit='angstrom', pressure_unit='GPa'):
         """
         Transforms a flat dictionary into a tiered data model.
         """
-        # Create the root of the DataModelDict
+        units = dict(energy=energy_unit, length=length_unit, pressure=pressure_unit)
+
         model = DM()
         model[self.contentroot] = calc = DM()
+        FIELDS.build(calc, params, units)
+        if params['status'] == 'finished':
+            FINISHED_FIELDS.build(calc, params, units)
 
-        # Assign uuid
-        calc['key'] = params['key']
-
-        # Save calculation parameters
-        calc['calculation'] = DM()
-        calc['calculation']['iprPy-version'] = params['iprPy_version']
-        calc['calculation']['atomman-version'] = params['atomman_version']
-        calc['calculation']['LAMMPS-version'] = params['LAMMPS_version']
-
-        calc['calculation']['script'] = params['script']
-        calc['calculation']['run-parameter'] = run_params = DM()
-
-        run_params['size-multipliers'] = DM()
-        run_params['size-multipliers']['a'] = [params['a_mult1'], params['a_mult2']]
-        run_params['size-multipliers']['b'] = [params['b_mult1'], params['b_mult2']]
-        run_params['size-multipliers']['c'] = [params['c_mult1'], params['c_mult2']]
-
-        run_params['energytolerance'] = params['min_etol']
-        run_params['forcetolerance'] = uc.model(params['min_ftol'], 
-                                                energy_unit + '/' + length_unit)
-        run_params['maxiterations']  = params['min_maxiter']
-        run_params['maxevaluations'] = params['min_maxeval']
-        run_params['maxatommotion']  = uc.model(params['min_dmax'],
-                                                length_unit)
-
-        # Copy over potential data model info
-        calc['potential-LAMMPS'] = DM()
-        calc['potential-LAMMPS']['key'] = params['potential_LAMMPS_key']
-        calc['potential-LAMMPS']['id'] = params['potential_LAMMPS_id']
-        calc['potential-LAMMPS']['potential'] = DM()
-        calc['potential-LAMMPS']['potential']['key'] = params['potential_key']
-        calc['potential-LAMMPS']['potential']['id'] = params['potential_id']
-
-        # Save info on system file loaded
-        calc['system-info'] = DM()
-        calc['system-info']['family'] = params['family']
-        calc['system-info']['artifact'] = DM()
-        calc['system-info']['artifact']['file'] = params['load_file']
-        calc['system-info']['artifact']['format'] = params['load_style']
-        calc['system-info']['artifact']['load_options'] = params['load_options']
-        for symbol in params['symbols'].split(' '):
-            calc['system-info'].append('symbol', symbol)
-
-        # Save phase-state info
-        calc['phase-state'] = DM()
-        calc['phase-state']['temperature'] = uc.model(params['temperature'], 'K')
-        calc['phase-state']['pressure-xx'] = uc.model(params['pressure_xx'],
-                                                      pressure_unit)
-        calc['phase-state']['pressure-yy'] = uc.model(params['pressure_yy'],
-                                                      pressure_unit)
-        calc['phase-state']['pressure-zz'] = uc.model(params['pressure_zz'],
-                                                      pressure_unit)
-        calc['phase-state']['pressure-xy'] = uc.model(params['pressure_xy'],
-                                                      pressure_unit)
-        calc['phase-state']['pressure-xz'] = uc.model(params['pressure_xz'],
-                                                      pressure_unit)
-        calc['phase-state']['pressure-yz'] = uc.model(params['pressure_yz'],
-                                                      pressure_unit)
-
-        if params['status'] != 'finished':
-            calc['status'] = params['status']
-        else:
-            # Save info on initial and final configuration files
-            calc['initial-system'] = DM()
-            calc['initial-system']['artifact'] = DM()
-            calc['initial-system']['artifact']['file'] = params['initial_load_file']
-            calc['initial-system']['artifact']['format'] = params['initial_load_style']
-            if params['initial_load_options'] is not None:
-                calc['initial-system']['artifact']['load_options'] = params['initial_load_options']
-            for symbol in params['initial_symbols'].split(' '):
-                calc['initial-system'].append('symbols', symbol)
-
-            calc['final-system'] = DM()
-            calc['final-system']['artifact'] = DM()
-            calc['final-system']['artifact']['file'] = params['final_load_file']
-            calc['final-system']['artifact']['format'] = params['final_load_style']
-            if params['final_load_options'] is not None:
-                calc['final-system']['artifact']['load_options'] = params['final_load_options']
-            for symbol in params['final_symbols'].split(' '):
-                calc['final-system'].append('symbols', symbol)
-            
-            # Save measured box parameter info
-            calc['measured-box-parameter'] = mbp = DM()
-            mbp['lx'] = uc.model(params['lx'], length_unit)
-            mbp['ly'] = uc.model(params['ly'], length_unit)
-            mbp['lz'] = uc.model(params['lz'], length_unit)
-            mbp['xy'] = uc.model(params['xy'], length_unit)
-            mbp['xz'] = uc.model(params['xz'], length_unit)
-            mbp['yz'] = uc.model(params['yz'], length_unit)
-
-            # Save measured phase-state info
-            calc['measured-phase-state'] = mps = DM()
-            mps['temperature'] = uc.model(params['measured_temperature'], 'K')
-            mps['pressure-xx'] = uc.model(params['measured_pressure_xx'],
-                                          pressure_unit)
-            mps['pressure-yy'] = uc.model(params['measured_pressure_yy'],
-                                          pressure_unit)
-            mps['pressure-zz'] = uc.model(params['measured_pressure_zz'],
-                                          pressure_unit)
-            mps['pressure-xy'] = uc.model(params['measured_pressure_xy'],
-                                          pressure_unit)
-            mps['pressure-xz'] = uc.model(params['measured_pressure_xz'],
-                                          pressure_unit)
-            mps['pressure-yz'] = uc.model(params['measured_pressure_yz'],
-                                          pressure_unit)
-            
-            # Save the final cohesive energy
-            calc['cohesive-energy'] = uc.model(params['E_cohesive'], energy_unit)
-
-        return model
\ No newline at end of file
+        return model
@@ -0,0 +1,194 @@
+# coding: utf-8
+# Standard Python libraries
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+import itertools
+from collections import namedtuple
+
+# http://www.numpy.org/
+import numpy as np
+
+# https://github.com/usnistgov/DataModelDict
+from DataModelDict import DataModelDict as DM
+
+# https://github.com/usnistgov/iprPy
+from iprPy.tools import aslist
+
+from . import unitconvert
+
+# Marks a lookup that went through a missing key, and a field without default
+MISSING = object()
+REQUIRED = object()
+
+# A term of the flat dictionary: the dotted path of its value in the record
+# model, the same keys as reshape, the unit template of a value/unit term,
+# formatted with the working units when building a model, the default of an
+# optional term and whether the value is a list joined by spaces
+Field = namedtuple('Field', ['name', 'path', 'unit', 'default', 'joined'])
+
+def field(name, path, unit=None, default=REQUIRED, joined=False):
+    """
+    A Field with its dotted path split, the digits being list indices.
+    """
+    return Field(name, tuple(int(part) if part.isdigit() else part
+                             for part in path.split('.')), unit, default, joined)
+
+def same(value, default):
+    """
+    True if a value is the default of an optional term, nan included.
+    """
+    if default is REQUIRED:
+        return False
+    if isinstance(value, float) and isinstance(default, float):
+        return value == default or (np.isnan(value) and np.isnan(default))
+    return value is default or value == default
+
+def lookup(values, key):
+    """
+    The children at key of many containers, MISSING if absent.
+    """
+    if isinstance(key, int):
+        return [value[key] if isinstance(value, list) and key < len(value) else MISSING
+                for value in values]
+    return [MISSING if value is MISSING else value.get(key, MISSING)
+            for value in values]
+
+def flat_value(record, key, f):
+    """
+    The value of a field in a flat record, MISSING if absent. A value/unit
+    term is split in value and unit keys and a list in index keys.
+    """
+    if key in record:
+        return record[key]
+    if f.unit is not None and key + '.value' in record:
+        return dict(value=record[key + '.value'], unit=record.get(key + '.unit'))
+    if f.joined and key + '.0' in record:
+        return list(itertools.takewhile(
+            lambda value: value is not MISSING,
+            (record.get('{0}.{1}'.format(key, i), MISSING) for i in itertools.count())))
+    return MISSING
+
+class Schema(object):
+    """
+    A list of fields compiled into a tree of their paths, so that each
+    container shared by many fields is only looked up once per record, and
+    the lookups of a node are done for all the records at once.
+
+    The layout is a list of dotted path prefixes giving the order of the
+    terms in a built model when it differs from the order of the fields.
+    """
+
+    def __init__(self, fields, layout=()):
+        self.fields = list(fields)
+        self.names = [f.name for f in self.fields]
+        self.layout = [tuple(field('', prefix).path) for prefix in layout]
+
+        def rank(f):
+            for i, prefix in enumerate(self.layout):
+                if f.path[:len(prefix)] == prefix:
+                    return i
+            return len(self.layout)
+        self.built = sorted(self.fields, key=rank)
+
+        self.tree = ({}, [])
+        for f in self.fields:
+            node = self.tree
+            for part in f.path:
+                node = node[0].setdefault(part, ({}, []))
+            node[1].append(f)
+        self.projections = {}
+
+    def project(self, names):
+        """
+        The schema of the given field names only, compiled once.
+        """
+        names = tuple(names)
+        if names not in self.projections:
+            self.projections[names] = Schema([f for f in self.fields if f.name in names])
+            self.projections[names].built = [f for f in self.built if f.name in names]
+        return self.projections[names]
+
+    def extract(self, calcs):
+        """
+        The columns of the flat dictionaries of many record contents, as a
+        dictionary of lists of values. The value/unit terms are converted to
+        working units and the joined terms joined by spaces.
+        """
+        columns = {}
+        stack = [(self.tree, calcs)]
+        while stack:
+            (children, leaves), values = stack.pop()
+            for f in leaves:
+                columns[f.name] = self.leaf(f, values)
+            for key, child in children.items():
+                stack.append((child, lookup(values, key)))
+        return columns
+
+    def extract_flat(self, records, prefix=''):
+        """
+        Same as extract for flat records with the dotted keys of reshape, as
+        streamed by stream_feature, the keys starting with prefix.
+        """
+        columns = {}
+        for f in self.fields:
+            key = prefix + '.'.join(str(part) for part in f.path)
+            columns[f.name] = self.leaf(f, [flat_value(record, key, f) for record in records])
+        return columns
+
+    @staticmethod
+    def leaf(f, values):
+        """
+        The values of a field from the values found at its path.
+        """
+        present = [i for i, value in enumerate(values) if value is not MISSING]
+        if len(present) < len(values) and f.default is REQUIRED:
+            raise KeyError('.'.join(str(part) for part in f.path))
+
+        found = [values[i] for i in present]
+        if f.unit is not None:
+            found = list(unitconvert.values_units(found))
+        elif f.joined:
+            found = [' '.join(aslist(value)) for value in found]
+        if len(present) == len(values):
+            return found
+
+        column = [f.default] * len(values)
+        for i, value in zip(present, found):
+            column[i] = value
+        return column
+
+    def build(self, calc, params, units):
+        """
+        Writes the terms of a flat dictionary in the record content calc, in
+        the order of the layout. The optional terms are only written if they
+        differ from their default.
+        """
+        for f in self.built:
+            value = params[f.name]
+            if same(value, f.default):
+                continue
+
+            container = calc
+            for part, following in zip(f.path[:-1], f.path[1:]):
+                if isinstance(part, int):
+                    while len(container) <= part:
+                        container.append(DM())
+                    container = container[part]
+                else:
+                    if part not in container:
+                        container[part] = [] if isinstance(following, int) else DM()
+                    container = container[part]
+
+            key = f.path[-1]
+            if f.unit is not None:
+                value = unitconvert.model(value, f.unit.format(**units))
+            if isinstance(key, int):
+                while len(container) <= key:
+                    container.append(None)
+                container[key] = value
+            elif f.joined:
+                for item in value.split(' '):
+                    container.append(key, item)
+            else:
+                container[key] = value
+        return calc
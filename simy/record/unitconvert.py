@@ -0,0 +1,49 @@
+# coding: utf-8
+# Standard Python libraries
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+# http://www.numpy.org/
+import numpy as np
+
+# https://github.com/usnistgov/DataModelDict
+from DataModelDict import DataModelDict as DM
+
+# https://github.com/pytoolz/toolz
+from toolz import memoize
+
+# https://github.com/usnistgov/atomman
+import atomman.unitconvert as uc
+
+@memoize
+def factor(unit):
+    """
+    Scaling factor from the unit to working units, parsed once per unit.
+    """
+    return uc.parse(unit)
+
+def values_units(terms):
+    """
+    Reads the values of many value/unit terms in working units with a single
+    multiplication.
+    """
+    if len(terms) == 0:
+        return np.zeros(0)
+    values = np.array([term['value'] for term in terms], dtype=float)
+    units = [term.get('unit', None) for term in terms]
+    index = {}
+    for unit in units:
+        index.setdefault(unit, len(index))
+    factors = np.array([factor(unit) for unit in index], dtype=float)
+    return values * factors[[index[unit] for unit in units]]
+
+def model(value, units=None):
+    """
+    Same as atomman.unitconvert.model for a single value, with the unit
+    factor cached.
+    """
+    datamodel = DM()
+    datamodel['value'] = np.asarray(value) / factor(units)
+    if units is not None:
+        datamodel['unit'] = units
+    return datamodel
@@ -0,0 +1,29 @@
+from simy import benchmarks
+from simy.record import CalculationRelaxStatic
+from duplicates import duplicates_allclose
+
+class TestBenchmarks:
+
+    def test_generate(self):
+        """testing the duplicate rate of the generated records.
+        """
+        record = CalculationRelaxStatic(None, None)
+        frame = benchmarks.generate(500, duplicate_rate=0.2, cardinality=3)
+        assert len(frame) == 500
+        assert frame.key.is_unique
+        assert set(frame.potential_id) == set('potential-id-{0}'.format(i) for i in range(3))
+
+        duplicates = duplicates_allclose(
+            frame, record.compare_terms, record.compare_fterms, method="grid")
+        assert duplicates.sum() == 100
+
+    def test_compare(self):
+        """testing the regressions against a baseline report.
+        """
+        baseline = dict(results=[dict(name="a", rows=10, seconds=1.0),
+                                 dict(name="b", rows=10, seconds=1.0)])
+        report = dict(results=[dict(name="a", rows=10, seconds=1.1),
+                               dict(name="b", rows=10, seconds=1.5),
+                               dict(name="b", rows=20, seconds=9.0)])
+        regressions = benchmarks.compare(report, baseline, threshold=0.2)
+        assert regressions == [dict(name="b", rows=10, seconds=1.5, baseline_seconds=1.0)]
@@ -0,0 +1,55 @@
+import glob
+import json
+import pytest
+from simy.features.reshape_feature import reshape
+from simy.record import CalculationRelaxStatic
+
+SOURCE = "database/calculation_relax_static/00999575-6044-4420-baf5-9bb33e60b02c.xml"
+ERROR = "database/calculation_relax_static/e4d14738-8e1c-4817-9746-5e4f26cec96d.xml"
+
+class TestCalculationRelaxStatic:
+
+    def test_memoized(self):
+        """testing that dict, json and xml are only computed once.
+        """
+        record = CalculationRelaxStatic("record", SOURCE)
+        assert record.dict is record.dict
+        assert record.json is record.json
+        assert record.xml is record.xml
+
+        params = record.dict
+        record.model = record.dicttomodel(dict(params, key="changed"))
+        assert record.dict["key"] == "changed"
+        assert record.dict["lx"] == params["lx"]
+
+    def test_fields(self):
+        """testing the projection on the comparison terms.
+        """
+        record = CalculationRelaxStatic("record", SOURCE)
+        fields = record.compare_terms + list(record.compare_fterms)
+        projected = CalculationRelaxStatic("record", SOURCE, fields=fields)
+
+        assert list(projected.dict) == fields
+        assert projected.dict == {field: record.dict[field] for field in fields}
+
+    def test_modelstodicts(self):
+        """testing the batch flattening against the flattening of each record.
+        """
+        records = [CalculationRelaxStatic(path, path) for path in sorted(
+            glob.glob("database/calculation_relax_static/*.xml"))[:20]]
+        dicts = records[0].modelstodicts([record.model for record in records])
+        for record, params in zip(records, dicts):
+            assert list(params) == list(record.dict)
+            assert all(params[key] == value or value != value
+                       for key, value in record.dict.items())
+
+    def test_dicttomodel(self):
+        """testing that a flat dictionary is built back into the model it was
+        flattened from, in the same order.
+        """
+        for path in [SOURCE, ERROR]:
+            record = CalculationRelaxStatic("record", path)
+            built = reshape(json.loads(record.dicttomodel(record.dict).json()))
+            source = reshape(json.loads(record.json))
+            assert list(built) == list(source)
+            assert all(value == pytest.approx(source[key]) for key, value in built.items())
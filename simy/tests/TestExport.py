@@ -0,0 +1,65 @@
+from simy.features import export_feature, load_feature, stream_feature
+from simy.record import CalculationRelaxStatic
+import glob
+import os
+import shutil
+import tempfile
+
+class TestExport:
+
+    def setup_method(self):
+        self.store = tempfile.mkdtemp()
+        self.destination = tempfile.mkdtemp()
+        for path in sorted(glob.glob("database/calculation_relax_static/*.xml"))[:6]:
+            shutil.copy(path, self.store)
+        self.frame = load_feature.load(self.store, processes=1)
+        self.record = CalculationRelaxStatic(None, None)
+
+    def teardown_method(self):
+        shutil.rmtree(self.store)
+        shutil.rmtree(self.destination)
+
+    def reload(self, path):
+        return self.record.flatstodicts(list(stream_feature.iterrecords(path)))
+
+    def test_export_files(self):
+        """testing that the exported record files load back the same records.
+        """
+        directory = os.path.join(self.destination, "records")
+        assert export_feature.export(self.frame, directory=directory, processes=2, batch=2) == 6
+        exported = load_feature.load(directory, processes=1)
+        columns = [column for column in self.frame.columns if column not in load_feature.CACHE_COLUMNS]
+        assert list(exported.key) == list(self.frame.key)
+        assert exported[columns].equals(self.frame[columns])
+
+    def test_export_unchanged(self):
+        """testing that only the changed records are written again.
+        """
+        directory = os.path.join(self.destination, "records")
+        export_feature.export(self.frame, directory=directory, processes=1)
+        path = os.path.join(directory, "{0}.xml".format(self.frame.key.iloc[0]))
+        os.remove(path)
+        other = os.path.join(directory, "{0}.xml".format(self.frame.key.iloc[1]))
+        mtime = os.stat(other).st_mtime_ns
+        with open(other, 'a') as other_f:
+            other_f.write(" ")
+        size = os.stat(other).st_size
+
+        export_feature.export(self.frame, directory=directory, processes=1, unchanged=True)
+        assert os.path.exists(path)
+        assert os.stat(other).st_size == size and os.stat(other).st_mtime_ns >= mtime
+
+        export_feature.export(self.frame, directory=directory, processes=1)
+        assert os.stat(other).st_size == size - 1
+
+    def test_export_single(self):
+        """testing the json lines and xml dump files.
+        """
+        expected = self.reload(os.path.join(self.store, "{0}.xml".format(self.frame.key.iloc[0])))
+        for fmt in ['json', 'xml']:
+            out = os.path.join(self.destination, "records.{0}".format(fmt))
+            export_feature.export(self.frame, out=out, fmt=fmt, processes=1)
+            records = self.reload(out)
+            assert len(records) == 6
+            assert records[0].keys() == expected[0].keys()
+            assert records[0]['key'] == expected[0]['key']
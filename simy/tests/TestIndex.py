@@ -0,0 +1,58 @@
+from simy.features import index_feature
+import os
+import pandas as pd
+import tempfile
+
+class TestIndex:
+
+    def setup_method(self):
+        self.frame = pd.DataFrame(dict(
+            key=['a', 'b', 'c', 'd', 'e'],
+            A=['x', 'x', 'y', None, None],
+            B=[1.0, 1.01, 1.0, 2.0, 2.05],
+            C=[0.0, 0.0, 0.0, 0.0, float('nan')],
+        ))
+
+    def test_check(self):
+        """testing the similarity checks against a built index.
+        """
+        index = index_feature.SimilarityIndex.build(self.frame, ['A'], dict(B=0.02, C=0.1))
+        assert len(index) == 4
+        assert index.check(dict(A='x', B=1.005, C=0.05)) == ['a', 'b']
+        assert index.check(dict(A='y', B=1.005, C=0.05)) == ['c']
+        assert index.check(dict(A=float('nan'), B=2.01, C=0.0)) == ['d']
+        assert index.check(dict(A='x', B=1.005, C=0.2)) == []
+        assert index.check(dict(A='z', B=1.0, C=0.0)) == []
+
+    def test_insert(self):
+        """testing that inserted records are checked like built ones.
+        """
+        built = index_feature.SimilarityIndex.build(self.frame, ['A'], dict(B=0.02, C=0.1))
+        index = index_feature.SimilarityIndex(['A'], dict(B=0.02, C=0.1))
+        for record in self.frame.to_dict('records'):
+            index.insert(record['key'], record)
+
+        for record in self.frame.to_dict('records'):
+            assert index.check(record) == built.check(record)
+
+    def test_save(self):
+        """testing the persistence of an index.
+        """
+        index = index_feature.SimilarityIndex.build(self.frame, ['A'], dict(B=0.02, C=0.1))
+        path = os.path.join(tempfile.mkdtemp(), "index.pkl")
+        index.save(path)
+        loaded = index_feature.SimilarityIndex.load(path)
+        loaded.insert('f', dict(A='y', B=1.01, C=0.0))
+        assert loaded.check(dict(A='y', B=1.0, C=0.0)) == ['c', 'f']
+        os.remove(path)
+
+    def test_remove(self):
+        """testing that removed records are no longer found.
+        """
+        index = index_feature.SimilarityIndex.build(self.frame, ['A'], dict(B=0.02, C=0.1))
+        record = dict(A='x', B=1.005, C=0.05)
+        index.remove('a', index.bucket(record))
+        assert index.check(record) == ['b']
+        index.remove('b', index.bucket(record))
+        index.remove('b', index.bucket(record))
+        assert index.check(record) == [] and len(index) == 2
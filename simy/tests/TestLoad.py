@@ -0,0 +1,56 @@
+from simy.features import load_feature
+from duplicates import profiled
+import glob
+import os
+import shutil
+import tempfile
+
+class TestLoad:
+
+    def setup_method(self):
+        self.store = tempfile.mkdtemp()
+        for path in sorted(glob.glob("database/calculation_relax_static/*.xml"))[:4]:
+            shutil.copy(path, self.store)
+
+    def teardown_method(self):
+        shutil.rmtree(self.store)
+
+    def test_load(self):
+        """testing the parallel load of a store directory.
+        """
+        frame = load_feature.load(self.store, processes=2)
+        assert len(frame) == 4
+        assert list(frame.columns[:2]) == ['key', 'script']
+        assert frame.equals(load_feature.load(self.store, processes=1))
+
+    def test_iterdicts(self):
+        """testing that the streamed records are the loaded ones.
+        """
+        frame = load_feature.load(self.store, processes=1)
+        dicts = list(load_feature.iterdicts(self.store, batch=3))
+        assert [params['key'] for params in dicts] == list(frame.key)
+        assert list(dicts[0]) == list(frame.columns)
+
+    def test_load_cache(self):
+        """testing that the cache only keeps the unchanged files.
+        """
+        cache = os.path.join(self.store, "cache.pkl")
+        frame = load_feature.load(self.store, cache=cache)
+
+        paths = sorted(glob.glob(os.path.join(self.store, "*.xml")))
+        os.remove(paths[0])
+        shutil.copy(paths[1], os.path.join(self.store, "new.xml"))
+
+        reloaded = load_feature.load(self.store, cache=cache)
+        assert len(reloaded) == 4
+        assert list(reloaded.key) == list(frame.key[1:]) + list(frame.key[1:2])
+        assert reloaded.equals(load_feature.load(self.store))
+
+    def test_load_profile(self):
+        """testing the profile of the load stages.
+        """
+        with profiled() as stages:
+            load_feature.load(self.store, processes=1)
+        assert [stage['name'] for stage in stages] == ['load.stat', 'load.parse']
+        assert stages[1]['rows_in'] == stages[1]['rows_out'] == 4
+        assert stages[1]['peak_bytes'] > 0
@@ -0,0 +1,48 @@
+from simy.benchmarks.generate import generate
+from simy.features import matrix_feature
+from simy.record import CalculationRelaxStatic
+from duplicates import duplicates_allclose
+import numpy as np
+import shutil
+import tempfile
+
+class TestMatrix:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.record = CalculationRelaxStatic(None, None)
+        self.frame = generate(2000, cardinality=3)
+
+    def teardown_method(self):
+        shutil.rmtree(self.directory)
+
+    def write(self):
+        return matrix_feature.FeatureMatrix.write(
+            self.directory, self.frame, self.record.compare_terms, self.record.compare_fterms, chunksize=300)
+
+    def test_write(self):
+        """testing that the written matrix is mapped back with its metadata.
+        """
+        self.write()
+        matrix = matrix_feature.FeatureMatrix(self.directory)
+        assert isinstance(matrix.values, np.memmap)
+        assert len(matrix) == 2000 and matrix.keys == list(self.frame.key)
+        assert matrix.fcols == self.record.compare_fterms
+        columns = list(self.record.compare_fterms)
+        assert np.array_equal(matrix.values, self.frame[columns].values.astype(float))
+        assert np.shares_memory(matrix.frame()[columns[0]].values, matrix.values)
+
+    def test_duplicates(self):
+        """testing that the duplicates of the matrix are those of the records.
+        """
+        matrix = self.write()
+        expected = duplicates_allclose(
+            self.frame, self.record.compare_terms, self.record.compare_fterms, method="numpy")
+        dups = matrix.duplicates()
+        assert dups.sum() > 0
+        assert list(dups.index) == list(self.frame.key)
+        assert np.array_equal(dups.values, expected.values)
+        assert dups.equals(matrix.duplicates_parallel(partitions=4, processes=2))
+        grid = duplicates_allclose(
+            self.frame, self.record.compare_terms, self.record.compare_fterms, method="grid")
+        assert np.array_equal(matrix.duplicates(method="grid").values, grid.values)
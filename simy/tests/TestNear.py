@@ -0,0 +1,51 @@
+from simy.features import near_feature, reshape_feature
+import numpy as np
+
+class TestNear:
+
+    def setup_method(self):
+        random = np.random.RandomState(0)
+        self.records = []
+        for i in range(200):
+            self.records.append(reshape_feature.reshape({'measurement': {
+                'key': 'record-{0}'.format(i),
+                'sample': {'name': 'sample-{0}'.format(i % 20), 'tags': ['a', 'b']},
+                'energy': {'value': float(random.uniform(0, 100)), 'unit': 'eV'},
+                'steps': int(random.randint(0, 5)),
+            }}))
+        self.copies = []
+        for i, record in enumerate(self.records[:50]):
+            copy = dict(record)
+            copy['measurement.key'] = 'copy-{0}'.format(i)
+            copy['measurement.energy.value'] += random.uniform(-0.009, 0.009)
+            self.copies.append(copy)
+        self.tolerances = {'*.energy.value': 0.01}
+
+    def test_comparison(self):
+        """testing the split of the records and their verification.
+        """
+        comparison = near_feature.Comparison(self.tolerances, ['*.key'])
+        assert comparison.split({'x.key': 'a', 'x.steps': 1, 'x.energy.value': 0.5}) == (
+            (('x.energy.value', None), ('x.steps', '1')), {'x.energy.value': 0.5})
+        comparison = near_feature.Comparison(self.tolerances, key='key')
+        assert comparison.split({'x.key': 'a', 'x.potential.key': 'b'})[0] == (('x.potential.key', "'b'"),)
+        assert comparison.similar({'x.energy.value': 1.0}, {'x.energy.value': 1.005})
+        assert not comparison.similar({'x.energy.value': 1.0}, {'x.energy.value': 1.02})
+        assert not comparison.similar({'x.energy.value': 1.0}, {'x.energy.value': 1.0, 'x.steps': 1})
+
+    def test_near_duplicates(self):
+        """testing that the copies are found, and only them.
+        """
+        records = self.records + self.copies
+        first, second = near_feature.near_duplicates(records, self.tolerances, ['*.key'])
+        assert list(zip(first, second)) == [(i, 200 + i) for i in range(50)]
+
+    def test_index(self):
+        """testing the lookups of the copies in an index of the records.
+        """
+        index = near_feature.NearIndex(self.tolerances, ['*.key'])
+        for record in self.records:
+            index.insert(record['measurement.key'], record)
+        assert len(index) == 200
+        for i, copy in enumerate(self.copies):
+            assert index.query(copy) == ['record-{0}'.format(i)]
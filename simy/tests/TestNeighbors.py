@@ -0,0 +1,50 @@
+from simy.benchmarks.generate import generate
+from simy.features import neighbors_feature
+from simy.record import CalculationRelaxStatic
+from scipy.spatial.distance import cdist
+import numpy as np
+import pandas as pd
+
+class TestNeighbors:
+
+    def setup_method(self):
+        self.record = CalculationRelaxStatic(None, None)
+        self.frame = generate(600, cardinality=2)
+
+    def test_nearest(self):
+        """testing the neighbours against the distances of all the pairs.
+        """
+        fcols = self.record.compare_fterms
+        report = neighbors_feature.nearest(self.frame, self.record.compare_terms, fcols, k=3, processes=1)
+        assert list(report.columns) == neighbors_feature.COLUMNS
+
+        points = self.frame[list(fcols)].values / np.array(list(fcols.values()))
+        distances = cdist(points, points, 'chebyshev')
+        groups = self.frame.groupby(self.record.compare_terms, dropna=False).ngroup().values
+        distances[groups[:, None] != groups[None, :]] = np.inf
+        np.fill_diagonal(distances, np.inf)
+
+        positions = pd.Index(self.frame.key)
+        for key, neighbors in report.groupby('key', sort=False):
+            row = distances[positions.get_loc(key)]
+            expected = np.sort(row[np.isfinite(row)])[:3]
+            assert list(neighbors['rank']) == list(range(1, len(expected) + 1))
+            assert np.allclose(neighbors.distance.values, expected)
+            assert np.allclose(row[positions.get_indexer(neighbors.neighbor)], expected)
+
+    def test_nearest_parallel(self):
+        """testing that the groups searched in parallel give the same report.
+        """
+        args = (self.frame, self.record.compare_terms, self.record.compare_fterms)
+        serial = neighbors_feature.nearest(*args, k=2, processes=1)
+        assert serial.equals(neighbors_feature.nearest(*args, k=2, processes=2, rows=50))
+
+    def test_nearest_missing(self):
+        """testing that missing dcols are equal and missing fcols are not near.
+        """
+        frame = pd.DataFrame(dict(key=list('abcde'), A=['x', 'x', None, None, None],
+                                  B=[1.0, 1.01, 2.0, 2.05, np.nan]))
+        report = neighbors_feature.nearest(frame, ['A'], dict(B=0.02), k=2, processes=1)
+        assert list(report.key) == ['a', 'b', 'c', 'd']
+        assert list(report.neighbor) == ['b', 'a', 'd', 'c']
+        assert np.allclose(report.distance, [0.5, 0.5, 2.5, 2.5])
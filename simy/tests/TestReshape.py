@@ -80,3 +80,35 @@ class TestReshape:
             "calculation-relax-static.potential-LAMMPS.potential.key": "0856888b-57ec-4005-828d-d1b0c331f120"
         }
         assert reshape_feature.reshape(expected) == expected
+        assert reshape_feature.reshape(source) == expected
+
+    def test_reshape_many(self):
+        """testing the reshape of many records in one call.
+        """
+
+        sources = [
+            {"a": {"b": [1, {"c": "d"}]}, "e": []},
+            {"a": None, "f": {}},
+        ]
+
+        expected = [
+            {"a.b.0": 1, "a.b.1.c": "d", "e": []},
+            {"a": None, "f": {}},
+        ]
+        assert reshape_feature.reshape_many(sources) == expected
+
+    def test_reshape_stream(self, tmpdir):
+        """testing the streamed reshape of json files and json lines.
+        """
+
+        sources = [{"a": {"b": [index, {"c": "d"}]}} for index in range(5)]
+        paths = []
+        for index, source in enumerate(sources):
+            path = tmpdir.join("record.{0}.json".format(index))
+            path.write(json.dumps(source))
+            paths.append(str(path))
+
+        expected = reshape_feature.reshape_many(sources)
+        lines = [json.dumps(source) for source in sources]
+        assert list(reshape_feature.reshape_stream(reshape_feature.reshape_path, paths, processes=2, window=2)) == expected
+        assert list(reshape_feature.reshape_stream(reshape_feature.reshape_line, lines, processes=1)) == expected
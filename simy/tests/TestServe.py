@@ -0,0 +1,81 @@
+from simy.features import index_feature, serve_feature
+import json
+import os
+import socket
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import pandas as pd
+
+class TestServe:
+
+    def setup_method(self):
+        frame = pd.DataFrame(dict(
+            key=['a', 'b', 'c'],
+            A=['x', 'x', 'y'],
+            B=[1.0, 1.01, 1.0],
+        ))
+        index = index_feature.SimilarityIndex.build(frame, ['A'], dict(B=0.02))
+        self.similarity = serve_feature.SimilarityServer(index)
+
+    def serve(self, server):
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_http(self):
+        """testing the reshape, check and insert requests over HTTP.
+        """
+        server = serve_feature.http_server(self.similarity, port=0)
+        self.serve(server)
+        url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+
+        def post(op, payload):
+            request = urllib.request.Request(url + op, json.dumps(payload).encode())
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+
+        try:
+            assert post('reshape', dict(record={'a': {'b': [1]}})) == dict(record={'a.b.0': 1})
+            assert post('check', dict(record=dict(A='x', B=1.005))) == dict(keys=['a', 'b'])
+            assert post('insert', dict(key='d', record=dict(A='z', B=1.0))) == dict(keys=[])
+            assert post('check', dict(record=dict(A='z', B=1.01))) == dict(keys=['d'])
+            try:
+                post('unknown', {})
+                assert False
+            except urllib.error.HTTPError as error:
+                assert error.code == 400
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unix(self):
+        """testing concurrent clients over a Unix socket.
+        """
+        path = os.path.join(tempfile.mkdtemp(), 'simy.sock')
+        server = serve_feature.unix_server(self.similarity, path)
+        self.serve(server)
+        results = []
+
+        def client():
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(path)
+            stream = connection.makefile('rwb')
+            for _ in range(10):
+                stream.write(json.dumps(dict(op='check', record=dict(A='x', B=1.0))).encode() + b'\n')
+                stream.flush()
+                results.append(json.loads(stream.readline()))
+            connection.close()
+
+        try:
+            clients = [threading.Thread(target=client) for _ in range(4)]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+            assert results == [dict(keys=['a', 'b'])] * 40
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HEAVY = ['numpy', 'pandas', 'DataModelDict', 'atomman', 'iprPy']
+
+SCRIPT = """
+import json, sys
+import simy
+if sys.argv[1:]:
+    from simy.main.cli import handle
+    try:
+        handle(sys.argv[1:])
+    except SystemExit:
+        pass
+print(json.dumps([name for name in {heavy} if name in sys.modules]))
+""".format(heavy=HEAVY)
+
+def startup(*args):
+    """imports simy and runs the simy command line if given arguments in a
+    new interpreter, returns the heavy modules imported. The modules rather
+    than the wall time are checked, which would depend on the load of the
+    machine.
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-c", SCRIPT] + list(args),
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    return json.loads(output.decode().strip().split("\n")[-1])
+
+class TestStartup:
+
+    def test_import(self):
+        """testing that importing simy does not import the heavy modules.
+        """
+        assert startup() == []
+
+    def test_help(self):
+        """testing that simy --help does not import the heavy modules.
+        """
+        assert startup("--help") == []
+
+    def test_reshape(self):
+        """testing that simy reshape does not import the heavy modules.
+        """
+        source = os.path.join(tempfile.mkdtemp(), "record.json")
+        with open(source, "w") as source_f:
+            source_f.write(json.dumps({"a": {"b": [1, 2]}}))
+
+        assert startup("reshape", "--src", source, "--prt") == []
+        os.remove(source)
@@ -0,0 +1,42 @@
+from simy.features import store_feature
+import os
+import shutil
+import tempfile
+
+RECORDS = [
+    dict(key='a', A='x', B=1.0, C=0.0),
+    dict(key='b', A='x', B=1.01, C=0.0),
+    dict(key='c', A='y', B=1.0, C=0.0),
+    dict(key='d', A=None, B=2.0, C=0.0),
+    dict(key='e', A=None, B=2.05, C=float('nan')),
+    dict(key='f', A='x', B=1.025, C=0.0),
+]
+
+class TestStore:
+
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "store.db")
+
+    def teardown_method(self):
+        shutil.rmtree(self.directory)
+
+    def test_check(self):
+        """testing the similarity checks against a SQLite store.
+        """
+        store = store_feature.SqliteStore(self.path, ['A'], dict(B=0.02, C=0.1))
+        store.ingest(RECORDS, batch=4)
+        assert len(store) == 6
+
+        store = store_feature.SqliteStore(self.path)
+        assert store.check(dict(A='x', B=1.005, C=0.05)) == ['a', 'b']
+        assert store.check(dict(A=None, B=2.01, C=0.0)) == ['d']
+        assert store.check(dict(A='x', B=1.005, C=float('nan'))) == []
+        assert store.get('e')['B'] == 2.05
+
+    def test_duplicates(self):
+        """testing the keep first duplicates of a SQLite store.
+        """
+        store = store_feature.SqliteStore(self.path, ['A'], dict(B=0.02, C=0.1))
+        store.ingest(RECORDS)
+        assert store.duplicates(batch=2) == ['b']
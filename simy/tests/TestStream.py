@@ -0,0 +1,50 @@
+from simy.features import reshape_feature, stream_feature
+from simy.record import CalculationRelaxStatic
+import glob
+import io
+import json
+import os
+import tempfile
+
+class TestStream:
+
+    def setup_method(self):
+        self.paths = sorted(glob.glob("database/calculation_relax_static/*.xml"))[:5]
+        self.records = [CalculationRelaxStatic(path, path) for path in self.paths]
+        self.expected = [reshape_feature.reshape(json.loads(record.json)) for record in self.records]
+
+    def test_xml(self):
+        """testing that streamed xml files give the reshape of their model.
+        """
+        for path, expected in zip(self.paths, self.expected):
+            assert list(stream_feature.iterrecords(path)) == [expected]
+
+        element = '<a x="1"><b>1</b><b>2.5</b><c/><d y="2">t</d><e>01</e></a>'
+        assert list(stream_feature.iterrecords(io.BytesIO(element.encode()))) == [
+            {'a.@x': 1, 'a.b.0': 1, 'a.b.1': 2.5, 'a.c': None,
+             'a.d.@y': 2, 'a.d.#text': 't', 'a.e': '01'}]
+
+    def test_dumps(self):
+        """testing the streaming of concatenated xml and json dumps.
+        """
+        directory = tempfile.mkdtemp()
+        xml = os.path.join(directory, "dump.xml")
+        with open(xml, "w") as dump_f:
+            dump_f.write("\n".join(open(path).read() for path in self.paths))
+        assert list(stream_feature.iterrecords(xml)) == self.expected
+
+        dump = os.path.join(directory, "dump.json")
+        with open(dump, "w") as dump_f:
+            dump_f.write("".join(record.json for record in self.records[:2]))
+            dump_f.write("\n" + "\n".join(record.json for record in self.records[2:]))
+        assert list(stream_feature.iterrecords(dump)) == self.expected
+
+    def test_flatstodicts(self):
+        """testing the flat dictionaries of streamed records.
+        """
+        flats = [record for path in self.paths for record in stream_feature.iterrecords(path)]
+        dicts = self.records[0].flatstodicts(flats)
+        for record, params in zip(self.records, dicts):
+            assert list(params) == list(record.dict)
+            assert all(params[key] == value or value != value
+                       for key, value in record.dict.items())
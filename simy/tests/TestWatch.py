@@ -0,0 +1,77 @@
+from simy.features import watch_feature
+from simy.record import CalculationRelaxStatic
+import asyncio
+import glob
+import os
+import shutil
+import tempfile
+
+class TestWatch:
+
+    def setup_method(self):
+        self.store = tempfile.mkdtemp()
+        self.state = os.path.join(tempfile.mkdtemp(), "state.pkl")
+        self.paths = sorted(glob.glob("database/calculation_relax_static/*.xml"))[:3]
+        for path in self.paths:
+            shutil.copy(path, self.store)
+
+    def teardown_method(self):
+        shutil.rmtree(self.store)
+        shutil.rmtree(os.path.dirname(self.state))
+
+    def poll(self):
+        record = CalculationRelaxStatic(None, None)
+        watcher = watch_feature.Watcher(self.store, record.compare_terms, record.compare_fterms, self.state)
+        events = []
+        asyncio.get_event_loop().run_until_complete(watcher.watch(events.append, processes=1, once=True))
+        return events
+
+    def test_watch(self):
+        """testing that only the new, modified or removed files give events.
+        """
+        events = self.poll()
+        assert [event['duplicate'] for event in events] == [False] * 3
+        assert self.poll() == []
+
+        key = os.path.splitext(os.path.basename(self.paths[0]))[0]
+        copy = os.path.join(self.store, "copy.xml")
+        with open(self.paths[0], 'r') as source_f:
+            content = source_f.read().replace(key, "copy")
+        with open(copy, 'w') as copy_f:
+            copy_f.write(content)
+        events = self.poll()
+        assert [(event['key'], event['of']) for event in events] == [("copy", [key])]
+
+        with open(copy, 'a') as copy_f:
+            copy_f.write("\n")
+        events = self.poll()
+        assert [(event['key'], event['of']) for event in events] == [("copy", [key])]
+
+        os.remove(os.path.join(self.store, os.path.basename(self.paths[0])))
+        events = self.poll()
+        assert [(event['event'], event.get('duplicate')) for event in events] == [
+            ('removed', None), ('record', False)]
+        assert events[1]['key'] == "copy"
+        assert self.poll() == []
+
+    def test_watch_error(self):
+        """testing that a file that fails to parse is reported once.
+        """
+        self.poll()
+        with open(os.path.join(self.store, "broken.xml"), 'w') as broken_f:
+            broken_f.write("<calculation-relax-static><key>")
+        assert [event['event'] for event in self.poll()] == ['error']
+        assert self.poll() == []
+
+    def test_watch_chain(self):
+        """testing that the records are only checked against the kept records.
+        """
+        watcher = watch_feature.Watcher(self.store, ['A'], {'B': 0.2})
+        records = [dict(key=str(i), A='a', B=value) for i, value in enumerate([0.1, 0.25, 0.4])]
+        events = watcher.update("batch.xml", (0, 0), records)
+        assert [(event['duplicate'], event['of']) for event in events] == [
+            (False, []), (True, ['0']), (False, [])]
+        events = watcher.update("other.xml", (0, 0), [dict(key='3', A='a', B=0.3)])
+        assert events[0]['of'] == ['0', '2']
+        watcher.forget("batch.xml")
+        assert watcher.files["other.xml"][:2] == (None, None)